@@ -1,10 +1,17 @@
+import asyncio
+import json
 from typing import List, Dict, Any
 from datetime import datetime, timedelta, timezone
 
-from fastapi import APIRouter, Query
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 
-from app.schemas.message import AllDevEUIResponse, MessageQuery
+from app.schemas.message import AllDevEUIResponse, DeviceStatusResponse, MessageQuery
 from app.services.message_service import get_all_dev_euis, get_messages_by_dev_eui, get_all_devices_latest_data
+from app.services.liveness_service import liveness_tracker
+from app.services.storage_service import get_raw_event
 
 # FastAPI의 APIRouter 사용
 router = APIRouter()
@@ -12,6 +19,9 @@ router = APIRouter()
 # 한국 시간대 (UTC+9)
 KST = timezone(timedelta(hours=9))
 
+# 이벤트 스트림 keep-alive 주기 (초)
+STREAM_KEEPALIVE_SECONDS = 15
+
 
 @router.get("/dev_euis", response_model=List[str])
 async def list_all_dev_euis():
@@ -25,6 +35,59 @@ async def list_all_devices_with_latest_data():
     return await get_all_devices_latest_data()
 
 
+@router.get("/devices/status", response_model=List[DeviceStatusResponse])
+async def list_device_statuses():
+    """디바이스별 생존/배터리 상태 반환 (수집 경로에서 실시간 갱신)"""
+    return [
+        DeviceStatusResponse(
+            dev_eui=device.dev_eui,
+            status=device.status,
+            last_seen=device.last_seen,
+            expected_interval_seconds=device.expected_interval,
+            battery=device.battery,
+            low_battery=device.low_battery
+        )
+        for device in liveness_tracker.statuses()
+    ]
+
+
+@router.get("/devices/status/stream")
+async def stream_device_status(request: Request):
+    """offline/online/배터리 상태 변화 이벤트 스트림 (Server-Sent Events)"""
+    async def event_stream():
+        queue = liveness_tracker.subscribe()
+        try:
+            # 접속 직후 최근 이벤트 먼저 전송
+            for event in list(liveness_tracker.recent_events):
+                yield f"data: {json.dumps(event)}\n\n"
+
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"data: {json.dumps(event)}\n\n"
+        finally:
+            liveness_tracker.unsubscribe(queue)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@router.get("/raw/{message_id}", response_model=Dict[str, Any])
+async def get_raw_message(message_id: str):
+    """메시지의 ChirpStack 원본 이벤트 반환 (slim 저장 모드에서는 압축 해제)"""
+    try:
+        object_id = ObjectId(message_id)
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="Invalid message id")
+
+    raw_event = await get_raw_event(object_id)
+    if raw_event is None:
+        raise HTTPException(status_code=404, detail="Message not found")
+    return raw_event
+
+
 @router.get("/dev_euis/{dev_eui}", response_model=Dict[str, Any])
 async def get_device_info(
     dev_eui: str, 
@@ -39,7 +102,7 @@ async def get_device_info(
         dev_eui=dev_eui,
         page=page,
         page_size=page_size,
-        sort_by="content.values.publishedAt",  # MongoDB 필드 경로
+        sort_by="ts",  # 대표 시각 필드 (UTC datetime)
         sort_order=-1
     )
     
@@ -25,6 +25,52 @@ class Settings(BaseSettings):
     RABBITMQ_QUEUE: str
     RABBITMQ_EXCHANGE: str
     RABBITMQ_ROUTING_KEY: str
+
+    # 업링크 중복 제거 (in-process TTL/LRU 캐시)
+    DEDUP_CACHE_SIZE: int = 100000
+    DEDUP_CACHE_TTL_SECONDS: int = 3600
+
+    # 저장 방식 - "full": 이벤트 전체 저장, "slim": 조회용 필드만 저장 + 원본은 raw 컬렉션에 zstd 압축
+    STORAGE_MODE: str = "full"
+    RAW_COLLECTION: str = "messages_raw"
+    RAW_COMPRESSION_LEVEL: int = 3
+
+    # 저장소 - "collection": 일반 messages 컬렉션, "timeseries": MongoDB time-series 컬렉션
+    STORAGE_BACKEND: str = "collection"
+    TIMESERIES_COLLECTION: str = "telemetry"
+    TIMESERIES_GRANULARITY: str = "minutes"
+
+    # 보존 정책 - 0이면 비활성화, 기간이 지난 데이터는 아카이브 파일로 내보낸 구간만 삭제 (2일 이상)
+    RETENTION_DAYS: int = 0
+    ARCHIVE_DIR: str = "archive"
+    ARCHIVE_FORMAT: str = "parquet"  # "parquet" (pyarrow 필요) | "ndjson"
+    ARCHIVE_INTERVAL_SECONDS: int = 3600
+    # 내보내기 중 메모리에 모으는 최대 행 수 (넘으면 part 파일로 나눠 저장)
+    ARCHIVE_CHUNK_ROWS: int = 50000
+    # ARCHIVE_DIR가 모든 레플리카가 공유하는 영구 볼륨(PVC)일 때만 True - False면 아무것도 삭제하지 않음
+    ARCHIVE_SHARED_STORAGE: bool = False
+    # 아카이브 작업은 lease를 가진 레플리카 하나만 실행
+    ARCHIVE_LEASE_SECONDS: int = 900
+
+    # 디바이스 생존 추적 - 예상 주기 x OFFLINE_FACTOR 동안 수신이 없으면 offline
+    LIVENESS_DEFAULT_INTERVAL_SECONDS: int = 600
+    LIVENESS_OFFLINE_FACTOR: float = 3.0
+    LIVENESS_EVENT_HISTORY: int = 100
+    LOW_BATTERY_THRESHOLD: int = 20
+    # 파드마다 받는 업링크 사본 큐 최대 길이 (넘치면 오래된 사본부터 버림)
+    LIVENESS_QUEUE_MAX_LENGTH: int = 10000
+
+    # 소비 속도 조절 (backpressure) - MongoDB 저장 지연/처리 중 메시지 수 기준
+    FLOW_PREFETCH_MAX: int = 100
+    FLOW_PREFETCH_MIN: int = 1
+    FLOW_PREFETCH_STEP: int = 5
+    # 처리 중 메시지가 현재 prefetch를 가득 채운 채 지연이 높은 상태가 이 횟수만큼 이어지면 일시 중지
+    FLOW_SATURATION_TICKS: int = 3
+    # 일시 중지 후 처리 중 메시지가 prefetch x 이 비율 이하로 빠지면 재개
+    FLOW_RESUME_RATIO: float = 0.5
+    FLOW_LATENCY_HIGH_MS: int = 500
+    FLOW_LATENCY_CRITICAL_MS: int = 3000
+    FLOW_CHECK_INTERVAL_SECONDS: float = 1.0
     
     # CORS 설정 - 문자열로 받은 다음 검증 시 변환
     CORS_ORIGINS: str = "*"
@@ -42,6 +88,13 @@ class Settings(BaseSettings):
     #         return f"postgresql+asyncpg://{values['POSTGRES_USER']}:{values['POSTGRES_PASSWORD']}@{values['POSTGRES_SERVER']}:{values['POSTGRES_PORT']}/{values['POSTGRES_DB']}"
     #     return v
 
+    @validator("RETENTION_DAYS")
+    def check_retention_days(cls, v):
+        # 하루치는 다음 날 0시 이후에야 내보낼 수 있으므로 1일 보존은 내보내기 전에 삭제 시점이 옴
+        if v != 0 and v < 2:
+            raise ValueError(f"RETENTION_DAYS ({v}) must be 0 (disabled) or at least 2")
+        return v
+
     def get_cors_origins(self) -> List[str]:
         if self.CORS_ORIGINS == "*":
             return ["*"]
@@ -1,3 +1,4 @@
+import asyncio
 import json
 import logging
 from typing import Callable
@@ -6,13 +7,18 @@ from fastapi import FastAPI
 
 # SQLAlchemy 관련 import 제거
 # from app.db.base import engine, Base
+from app.core.config import get_settings
+from app.core.timeutils import extract_canonical_ts
 from app.db.mongodb import connect_to_mongodb, close_mongodb_connection
 from app.db.session import get_db
 from app.schemas.message import MessageCreate
+from app.services.archive_service import run_retention_loop
+from app.services.liveness_service import liveness_tracker, rehydrate_liveness, run_liveness_loop
 from app.services.message_service import MessageService, create_message
 from app.services.rabbitmq_service import RabbitMQService
 
 logger = logging.getLogger("__name__")
+settings = get_settings()
 
 async def process_message(payload: dict):
     """Process incoming messages from RabbitMQ."""
@@ -24,9 +30,24 @@ async def process_message(payload: dict):
             content = payload,
             routing_key = routing_key
         )
-        await create_message(message_data)
+        created = await create_message(message_data)
+        if created is None:
+            logger.info(f"Duplicate message ignored: {payload}")
+            return
         logger.info(f"Message saved to database: {payload}")
 
+async def observe_uplink(payload: dict):
+    """
+    디바이스 생존 상태 갱신
+
+    작업 큐는 레플리카끼리 나눠 받으므로 모든 파드가 받는 업링크 사본(RabbitMQService.observe)으로 갱신한다.
+    devEUI가 없는 메시지는 "default" 디바이스로 추적하지 않는다.
+    """
+    values = payload.get("values", {})
+    if not values.get("devEUI"):
+        return
+    liveness_tracker.observe(values["devEUI"], extract_canonical_ts(payload), values.get("batteryLevel"))
+
 def create_start_app_handler(app: FastAPI) -> Callable:
     """
     Create a function that handles app startup
@@ -34,9 +55,21 @@ def create_start_app_handler(app: FastAPI) -> Callable:
     async def start_app() -> None:
         await connect_to_mongodb()
 
+        # 보존 정책: 아카이브 후 내보낸 구간 삭제
+        app.state.retention_task = None
+        if settings.RETENTION_DAYS > 0:
+            app.state.retention_task = asyncio.create_task(run_retention_loop())
+
         # Set up RabbitMQ connection
         app.state.rabbitmq = RabbitMQService()
         await app.state.rabbitmq.connect()
+
+        # 디바이스 생존 추적: 업링크 사본 수신을 먼저 시작하고 MongoDB에서 복원 후 타이머 시작
+        # (observe는 최신 시각만 반영하므로 복원과 순서가 섞여도 됨)
+        await app.state.rabbitmq.observe(observe_uplink)
+        await rehydrate_liveness()
+        app.state.liveness_task = asyncio.create_task(run_liveness_loop())
+
         await app.state.rabbitmq.consume(process_message)
 
     return start_app
@@ -46,6 +79,9 @@ def create_stop_app_handler(app: FastAPI) -> Callable:
     Create a function that handles app shutdown
     """
     async def stop_app() -> None:
+        if app.state.retention_task:
+            app.state.retention_task.cancel()
+        app.state.liveness_task.cancel()
         await app.state.rabbitmq.close()
         await close_mongodb_connection()
     return stop_app
\ No newline at end of file
@@ -0,0 +1,31 @@
+import threading
+from collections import defaultdict
+from typing import Dict, Any
+
+
+class Metrics:
+    """프로세스 내부 카운터/게이지 저장소 (/metrics 에서 노출)"""
+    _lock = threading.Lock()
+    counters: Dict[str, int] = defaultdict(int)
+    gauges: Dict[str, float] = {}
+
+
+def inc(name: str, value: int = 1):
+    """Increment a counter."""
+    with Metrics._lock:
+        Metrics.counters[name] += value
+
+
+def set_gauge(name: str, value: float):
+    """Set a gauge to the given value."""
+    with Metrics._lock:
+        Metrics.gauges[name] = value
+
+
+def snapshot() -> Dict[str, Any]:
+    """Return a copy of all current metric values."""
+    with Metrics._lock:
+        return {
+            "counters": dict(Metrics.counters),
+            "gauges": dict(Metrics.gauges),
+        }
@@ -0,0 +1,48 @@
+import re
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+# 소수점 이하 자릿수 (ChirpStack은 나노초 9자리까지 보냄)
+_FRACTION_PATTERN = re.compile(r'(\.\d{6})\d+')
+
+
+def parse_timestamp(value: Any) -> Optional[datetime]:
+    """
+    문자열/datetime 값을 UTC aware datetime으로 변환
+
+    - "2025-04-28T02:44:39.559014059Z" (나노초), "+09:00" 등 오프셋 포함 ISO 형식 지원
+    - 시간대 정보가 없으면 UTC로 간주
+    - 변환할 수 없으면 None 반환
+    """
+    if isinstance(value, datetime):
+        dt = value
+    elif isinstance(value, str) and value:
+        normalized = value.strip()
+        if normalized.endswith("Z"):
+            normalized = normalized[:-1] + "+00:00"
+        # datetime은 마이크로초(6자리)까지만 지원
+        normalized = _FRACTION_PATTERN.sub(r'\1', normalized)
+        try:
+            dt = datetime.fromisoformat(normalized)
+        except ValueError:
+            return None
+    else:
+        return None
+
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def extract_canonical_ts(content: dict) -> Optional[datetime]:
+    """ChirpStack 이벤트에서 대표 시각(ts) 추출"""
+    candidates = (
+        content.get("values", {}).get("publishedAt"),
+        content.get("publishedAt"),
+        (content.get("uplinkEvent") or {}).get("time"),
+    )
+    for candidate in candidates:
+        ts = parse_timestamp(candidate)
+        if ts is not None:
+            return ts
+    return None
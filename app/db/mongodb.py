@@ -1,13 +1,16 @@
 import logging
 
 from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo.errors import ConnectionFailure
+from pymongo.errors import CollectionInvalid, ConnectionFailure
 
 from app.core.config import get_settings
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
+# 예전 보존 정책의 TTL 인덱스 이름 (아카이브 여부와 관계없이 삭제하므로 더 이상 사용하지 않음)
+LEGACY_TTL_INDEX_NAME = "created_at_ttl"
+
 class MongoDB:
     client = None
     db = None
@@ -27,6 +30,70 @@ async def connect_to_mongodb():
         logger.error("Failed to connect to MongoDB.")
         raise
 
+    await ensure_indexes()
+
+async def ensure_indexes():
+    """Create indexes required by the service."""
+    # 중복 업링크 방지용 unique 인덱스 (dedup_key가 없는 기존 문서는 제외)
+    await MongoDB.db.messages.create_index(
+        "dedup_key",
+        unique=True,
+        partialFilterExpression={"dedup_key": {"$exists": True}},
+        name="dedup_key_unique"
+    )
+    # 디바이스별 기간 조회/최신순 정렬용
+    await MongoDB.db.messages.create_index(
+        [("content.values.devEUI", 1), ("ts", -1)],
+        name="dev_eui_ts"
+    )
+    await MongoDB.db.messages.create_index([("ts", -1)], name="ts")
+    # slim 문서용
+    await MongoDB.db.messages.create_index(
+        [("devEUI", 1), ("ts", -1)],
+        partialFilterExpression={"devEUI": {"$exists": True}},
+        name="slim_dev_eui_ts"
+    )
+
+    # 보존 기간 삭제용 - TTL 대신 아카이브가 끝난 구간만 직접 삭제
+    for name in ("messages", settings.RAW_COLLECTION):
+        collection = MongoDB.db[name]
+        if LEGACY_TTL_INDEX_NAME in await collection.index_information():
+            await collection.drop_index(LEGACY_TTL_INDEX_NAME)
+            logger.warning(f"Dropped legacy TTL index on {name}")
+        await collection.create_index("created_at", name="created_at")
+
+    if settings.STORAGE_BACKEND == "timeseries":
+        await ensure_timeseries_collection()
+
+async def ensure_timeseries_collection():
+    """Create the time-series collection and its indexes if missing."""
+    try:
+        await MongoDB.db.create_collection(
+            settings.TIMESERIES_COLLECTION,
+            timeseries={
+                "timeField": "ts",
+                "metaField": "meta",
+                "granularity": settings.TIMESERIES_GRANULARITY
+            }
+        )
+        logger.info(f"Created time-series collection: {settings.TIMESERIES_COLLECTION}")
+    except CollectionInvalid:
+        # 이미 존재
+        pass
+
+    # 예전 보존 정책의 자동 만료 해제 (아카이브가 끝난 구간만 직접 삭제)
+    collection_infos = await MongoDB.db.list_collections(filter={"name": settings.TIMESERIES_COLLECTION})
+    async for info in collection_infos:
+        if "expireAfterSeconds" in info.get("options", {}):
+            await MongoDB.db.command("collMod", settings.TIMESERIES_COLLECTION, expireAfterSeconds="off")
+            logger.warning(f"Disabled automatic expiry on {settings.TIMESERIES_COLLECTION}")
+
+    # 디바이스별 기간 조회/최신값 조회용 (time-series는 unique 인덱스 불가)
+    await MongoDB.db[settings.TIMESERIES_COLLECTION].create_index(
+        [("meta.devEUI", 1), ("ts", -1)],
+        name="meta_dev_eui_ts"
+    )
+
 async def close_mongodb_connection():
     """Close MongoDB connection."""
     if MongoDB.client:
@@ -2,7 +2,9 @@ import logging
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
+from app.core import metrics
 from app.core.config import get_settings
 from app.core.events import create_start_app_handler, create_stop_app_handler
 from app.api.api import api_router
@@ -36,3 +38,26 @@ app.include_router(api_router, prefix="/api")
 async def health_check():
     """Health check endpoint"""
     return {"status": "ok"}
+
+@app.get("/ready", tags=["health"])
+async def readiness_check():
+    """Readiness - 저장 지연으로 메시지 소비를 멈춘 상태면 503"""
+    rabbitmq = getattr(app.state, "rabbitmq", None)
+    if rabbitmq is None:
+        return JSONResponse(status_code=503, content={"status": "starting"})
+
+    flow = rabbitmq.flow
+    content = {
+        "status": flow.state,
+        "prefetch": flow.prefetch,
+        "in_flight": flow.in_flight,
+        "write_latency_ms": round(flow.latency_ms, 1),
+    }
+    if flow.is_paused:
+        return JSONResponse(status_code=503, content=content)
+    return content
+
+@app.get("/metrics", tags=["health"])
+async def get_metrics():
+    """In-process metrics (dedup hit rate 등)"""
+    return metrics.snapshot()
@@ -31,7 +31,7 @@ class MessageQuery(BaseModel):
     end_date: Optional[datetime] = None
     page: int = 1
     page_size: int = 10
-    sort_by: str = "content.publishedAt"
+    sort_by: str = "ts"
     sort_order: int = -1
 
 class PaginatedMessageResponse(BaseModel):
@@ -82,3 +82,23 @@ class AllDevEUIResponse(BaseModel):
                 self.publishedAt = self.publishedAt.replace(tzinfo=timezone.utc)
             kst_time = self.publishedAt.astimezone(KST)
             self.published_at_kst = kst_time.strftime('%Y-%m-%d %H:%M:%S KST')
+
+
+class DeviceStatusResponse(BaseModel):
+    dev_eui: str
+    status: str
+    last_seen: datetime
+    expected_interval_seconds: float
+    battery: Optional[int] = None
+    low_battery: bool = False
+
+    # 클라이언트에게 보여줄 때 KST로 변환된 날짜
+    last_seen_kst: str = Field(None)
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        if self.last_seen.tzinfo is None:
+            # timezone-naive 날짜는 UTC로 가정
+            self.last_seen = self.last_seen.replace(tzinfo=timezone.utc)
+        kst_time = self.last_seen.astimezone(KST)
+        self.last_seen_kst = kst_time.strftime('%Y-%m-%d %H:%M:%S KST')
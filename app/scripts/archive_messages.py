@@ -0,0 +1,34 @@
+"""
+보존 기간 정책용 아카이브를 수동으로 실행
+
+    python -m app.scripts.archive_messages
+
+아직 내보내지 않은 날짜(어제까지)를 디바이스/날짜 파티션 파일로 저장한다.
+이미 내보낸 날짜는 archive_state 컬렉션에 기록되어 건너뛴다.
+ARCHIVE_SHARED_STORAGE가 설정되어 있고 다른 레플리카가 lease를 가지고 있지 않을 때만 실행된다.
+"""
+import asyncio
+import logging
+
+from app.db.mongodb import connect_to_mongodb, close_mongodb_connection
+from app.services.archive_service import export_pending_days, release_archive_lease
+
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    await connect_to_mongodb()
+    try:
+        count = await export_pending_days()
+        logger.info(f"Archive completed: {count} messages")
+        await release_archive_lease()
+    finally:
+        await close_mongodb_connection()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level = logging.INFO,
+        format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    asyncio.run(main())
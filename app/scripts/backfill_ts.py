@@ -0,0 +1,86 @@
+"""
+기존 문서에 대표 시각(ts) 필드를 채우는 마이그레이션
+
+    python -m app.scripts.backfill_ts --batch-size 1000
+
+ts가 없는 문서만 _id 순서로 처리하므로 중단 후 다시 실행하면 이어서 진행된다.
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from pymongo import UpdateOne
+
+from app.core.timeutils import extract_canonical_ts
+from app.db.mongodb import MongoDB, connect_to_mongodb, close_mongodb_connection
+from app.services.message_service import convert_date_fields
+
+logger = logging.getLogger(__name__)
+
+
+def build_update(doc: dict) -> UpdateOne:
+    """문서 하나에 대한 ts/날짜 필드 업데이트 생성"""
+    content = doc.get("content") or {}
+    convert_date_fields(content)
+
+    # publishedAt을 읽을 수 없으면 저장 시각, 그것도 없으면 ObjectId 생성 시각 사용
+    ts = extract_canonical_ts(content) or doc.get("created_at") or doc["_id"].generation_time
+
+    return UpdateOne(
+        {"_id": doc["_id"]},
+        {"$set": {"ts": ts, "content": content}}
+    )
+
+
+async def backfill(batch_size: int):
+    collection = MongoDB.db.messages
+    pending_filter = {"ts": {"$exists": False}}
+
+    total = await collection.count_documents(pending_filter)
+    logger.info(f"Documents to backfill: {total}")
+
+    processed = 0
+    last_id = None
+    started = time.monotonic()
+
+    while True:
+        batch_filter = dict(pending_filter)
+        if last_id is not None:
+            batch_filter["_id"] = {"$gt": last_id}
+
+        cursor = collection.find(batch_filter, {"content": 1, "created_at": 1})
+        cursor.sort("_id", 1).limit(batch_size)
+        docs = await cursor.to_list(length=batch_size)
+        if not docs:
+            break
+
+        await collection.bulk_write([build_update(doc) for doc in docs], ordered=False)
+
+        processed += len(docs)
+        last_id = docs[-1]["_id"]
+        elapsed = time.monotonic() - started
+        rate = processed / elapsed if elapsed else 0.0
+        logger.info(f"Backfilled {processed}/{total} ({rate:.0f} docs/s), last _id: {last_id}")
+
+    logger.info(f"Backfill completed: {processed} documents")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Backfill canonical ts field")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    await connect_to_mongodb()
+    try:
+        await backfill(args.batch_size)
+    finally:
+        await close_mongodb_connection()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level = logging.INFO,
+        format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+"""
+일반 messages 컬렉션과 time-series 컬렉션의 저장 크기/조회 지연 비교
+
+    python -m app.scripts.benchmark_storage --runs 20 --devices 5
+
+같은 데이터가 양쪽에 있어야 의미가 있으므로 migrate_timeseries 실행 후 사용한다.
+"""
+import argparse
+import asyncio
+import datetime
+import logging
+import statistics
+import time
+
+from app.core.config import get_settings
+from app.db.mongodb import MongoDB, connect_to_mongodb, close_mongodb_connection
+from app.schemas.message import MessageQuery
+from app.services.message_service import get_all_dev_euis, get_all_devices_latest_data, get_messages_by_dev_eui
+from app.services.storage_service import STORAGE_BACKEND_COLLECTION, STORAGE_BACKEND_TIMESERIES
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+async def collection_stats(name: str) -> dict:
+    cursor = MongoDB.db[name].aggregate([{"$collStats": {"storageStats": {}}}])
+    stats = (await cursor.to_list(length=1))[0]["storageStats"]
+    return {
+        "count": stats.get("count", 0),
+        "size": stats.get("size", 0),
+        "storage_size": stats.get("storageSize", 0),
+        "index_size": stats.get("totalIndexSize", 0),
+    }
+
+
+async def measure(func, runs: int) -> dict:
+    """실행 시간(ms) 통계"""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await func()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "p50_ms": statistics.median(timings),
+        "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        "max_ms": timings[-1],
+    }
+
+
+async def benchmark_backend(backend: str, dev_euis: list, days: int, runs: int) -> dict:
+    """서비스 계층 조회 함수를 그대로 사용해 백엔드별 지연 측정"""
+    settings.STORAGE_BACKEND = backend
+    start_date = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=days)
+
+    async def device_history():
+        for dev_eui in dev_euis:
+            await get_messages_by_dev_eui(MessageQuery(dev_eui=dev_eui, start_date=start_date, page_size=100))
+
+    return {
+        "device_history": await measure(device_history, runs),
+        "latest_per_device": await measure(get_all_devices_latest_data, runs),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare regular vs time-series storage")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--devices", type=int, default=5, help="devices sampled for history queries")
+    parser.add_argument("--days", type=int, default=7, help="history query range in days")
+    args = parser.parse_args()
+
+    await connect_to_mongodb()
+    original_backend = settings.STORAGE_BACKEND
+    try:
+        for name in ("messages", settings.TIMESERIES_COLLECTION):
+            logger.info(f"[{name}] storage: {await collection_stats(name)}")
+
+        settings.STORAGE_BACKEND = STORAGE_BACKEND_COLLECTION
+        dev_euis = (await get_all_dev_euis())[:args.devices]
+
+        for backend in (STORAGE_BACKEND_COLLECTION, STORAGE_BACKEND_TIMESERIES):
+            result = await benchmark_backend(backend, dev_euis, args.days, args.runs)
+            for query_name, timing in result.items():
+                logger.info(f"[{backend}] {query_name}: " + ", ".join(f"{k}={v:.1f}" for k, v in timing.items()))
+    finally:
+        settings.STORAGE_BACKEND = original_backend
+        await close_mongodb_connection()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level = logging.INFO,
+        format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    asyncio.run(main())
@@ -0,0 +1,123 @@
+"""
+messages 컬렉션 문서를 time-series 컬렉션으로 복사하는 마이그레이션
+
+    python -m app.scripts.migrate_timeseries --batch-size 5000
+
+원본 messages 문서는 그대로 두고 같은 _id로 복사한다 (원본 이벤트 조회 유지).
+마지막으로 처리한 _id를 migration_state에 기록하므로 중단 후 다시 실행하면 이어서 진행된다.
+이미 복사된 _id는 건너뛰므로 배치 중간에 중단되어도 중복 문서가 생기지 않는다.
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from app.core.config import get_settings
+from app.core.timeutils import parse_timestamp
+from app.db.mongodb import MongoDB, connect_to_mongodb, close_mongodb_connection, ensure_timeseries_collection
+from app.services.storage_service import build_timeseries_document, extract_battery, extract_telemetry
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+MIGRATION_ID = "timeseries"
+
+
+def to_timeseries_document(doc: dict) -> dict:
+    """full/slim 문서를 time-series 문서로 변환"""
+    telemetry = extract_telemetry(doc)
+    ts_doc = build_timeseries_document({
+        "devEUI": telemetry["dev_eui"],
+        "device_name": telemetry["device_name"],
+        "tags": {"company": telemetry["company"], "type": telemetry["sensor_type"]},
+        "battery": extract_battery(doc),
+        "lat": telemetry["latitude"],
+        "lon": telemetry["longitude"],
+    })
+    ts_doc["_id"] = doc["_id"]
+    ts_doc["routing_key"] = doc.get("routing_key")
+    ts_doc["created_at"] = doc.get("created_at")
+    # ts 백필 전 문서 대비
+    ts_doc["ts"] = (
+        telemetry["ts"]
+        or parse_timestamp(telemetry["publishedAt"])
+        or doc.get("created_at")
+        or doc["_id"].generation_time
+    )
+    if doc.get("dedup_key"):
+        ts_doc["dedup_key"] = doc["dedup_key"]
+    return ts_doc
+
+
+async def migrate(batch_size: int):
+    source = MongoDB.db.messages
+    target = MongoDB.db[settings.TIMESERIES_COLLECTION]
+    state = MongoDB.db.migration_state
+
+    await ensure_timeseries_collection()
+
+    checkpoint = await state.find_one({"_id": MIGRATION_ID})
+    last_id = checkpoint["last_id"] if checkpoint else None
+
+    batch_filter = {}
+    if last_id is not None:
+        batch_filter["_id"] = {"$gt": last_id}
+        logger.info(f"Resuming migration after _id {last_id}")
+
+    total = await source.count_documents(batch_filter)
+    logger.info(f"Documents to migrate: {total}")
+
+    processed = 0
+    inserted = 0
+    started = time.monotonic()
+
+    while True:
+        if last_id is not None:
+            batch_filter["_id"] = {"$gt": last_id}
+
+        cursor = source.find(batch_filter).sort("_id", 1).limit(batch_size)
+        docs = await cursor.to_list(length=batch_size)
+        if not docs:
+            break
+
+        # 체크포인트 저장 전에 중단되면 같은 배치를 다시 읽으므로 이미 복사된 _id는 건너뜀
+        # (time-series 컬렉션은 unique 인덱스가 없어 중복 키 오류로 걸러지지 않음)
+        batch_ids = [doc["_id"] for doc in docs]
+        existing_ids = set(await target.distinct("_id", {"_id": {"$in": batch_ids}}))
+        new_docs = [to_timeseries_document(doc) for doc in docs if doc["_id"] not in existing_ids]
+        if new_docs:
+            await target.insert_many(new_docs, ordered=False)
+            inserted += len(new_docs)
+
+        processed += len(docs)
+        last_id = docs[-1]["_id"]
+        await state.update_one({"_id": MIGRATION_ID}, {"$set": {"last_id": last_id}}, upsert=True)
+
+        elapsed = time.monotonic() - started
+        rate = processed / elapsed if elapsed else 0.0
+        logger.info(f"Migrated {processed}/{total} ({rate:.0f} docs/s), last _id: {last_id}")
+
+    logger.info(f"Migration completed: {processed} read, {inserted} inserted")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Copy messages into the time-series collection")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--restart", action="store_true", help="ignore the saved checkpoint")
+    args = parser.parse_args()
+
+    await connect_to_mongodb()
+    try:
+        if args.restart:
+            await MongoDB.db.migration_state.delete_one({"_id": MIGRATION_ID})
+        await migrate(args.batch_size)
+    finally:
+        await close_mongodb_connection()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level = logging.INFO,
+        format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    asyncio.run(main())
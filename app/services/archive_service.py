@@ -0,0 +1,413 @@
+import asyncio
+import datetime
+import gzip
+import json
+import logging
+import os
+import socket
+import uuid
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import get_settings
+from app.core.timeutils import parse_timestamp
+from app.db.mongodb import MongoDB
+from app.services.storage_service import (
+    extract_battery, extract_telemetry, hot_collection, is_timeseries_backend, stores_raw_separately
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow가 없으면 NDJSON.gz로 저장
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+ARCHIVE_LEASE_ID = "archive"
+# 이 프로세스의 lease 소유자 식별자 (파드 이름 + 임의 값)
+LEASE_OWNER = f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+
+# 아카이브 파일에 저장하는 컬럼 (extract_telemetry 결과와 동일)
+ARCHIVE_COLUMNS = (
+    "id", "dev_eui", "device_name", "company", "sensor_type",
+    "battery", "longitude", "latitude", "ts",
+)
+
+if pa is not None:
+    ARCHIVE_SCHEMA = pa.schema([
+        ("id", pa.string()),
+        ("dev_eui", pa.string()),
+        ("device_name", pa.string()),
+        ("company", pa.string()),
+        ("sensor_type", pa.string()),
+        # 배터리 값이 없는 업링크는 null
+        pa.field("battery", pa.int64(), nullable=True),
+        ("longitude", pa.float64()),
+        ("latitude", pa.float64()),
+        ("ts", pa.timestamp("us", tz="UTC")),
+    ])
+
+
+def retention_cutoff() -> Optional[datetime.datetime]:
+    """이 시각 이전 데이터는 아카이브에서 조회 (보존 정책이 없으면 None)"""
+    if settings.RETENTION_DAYS <= 0:
+        return None
+    return datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=settings.RETENTION_DAYS)
+
+
+def archive_storage_ready() -> bool:
+    """
+    아카이브 디렉터리가 공유 영구 저장소인지 확인
+
+    파드 로컬 디스크에 내보내면 파드 재시작 시 파일이 사라지고, 다른 레플리카는 파일을 볼 수 없다.
+    이 상태에서 MongoDB 원본까지 지우면 데이터가 영구 유실되므로 허용하지 않는다.
+    """
+    if not settings.ARCHIVE_SHARED_STORAGE:
+        logger.error(
+            "ARCHIVE_SHARED_STORAGE is not enabled; refusing to archive or purge. "
+            "Mount a shared persistent volume at ARCHIVE_DIR and set ARCHIVE_SHARED_STORAGE=True."
+        )
+        return False
+    if not os.path.isdir(settings.ARCHIVE_DIR) or not os.access(settings.ARCHIVE_DIR, os.W_OK):
+        logger.error(f"Archive directory is missing or not writable: {settings.ARCHIVE_DIR}")
+        return False
+    return True
+
+
+async def acquire_archive_lease() -> bool:
+    """
+    아카이브 lease 획득/갱신
+
+    만료됐거나 이미 자신이 가진 lease만 가져올 수 있고,
+    다른 레플리카가 가진 경우 upsert가 _id 중복으로 실패한다.
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+    try:
+        await MongoDB.db.leases.find_one_and_update(
+            {"_id": ARCHIVE_LEASE_ID, "$or": [{"owner": LEASE_OWNER}, {"expires_at": {"$lt": now}}]},
+            {"$set": {
+                "owner": LEASE_OWNER,
+                "expires_at": now + datetime.timedelta(seconds=settings.ARCHIVE_LEASE_SECONDS),
+            }},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+async def release_archive_lease():
+    await MongoDB.db.leases.delete_one({"_id": ARCHIVE_LEASE_ID, "owner": LEASE_OWNER})
+
+
+def _use_parquet() -> bool:
+    return pa is not None and settings.ARCHIVE_FORMAT == "parquet"
+
+
+def _partition_dir(dev_eui: str, day: datetime.date) -> str:
+    # 디바이스 단위 조회가 많으므로 devEUI/날짜 순으로 파티셔닝
+    return os.path.join(settings.ARCHIVE_DIR, f"dev_eui={dev_eui}", f"date={day.isoformat()}")
+
+
+def _to_row(doc: dict) -> dict:
+    telemetry = extract_telemetry(doc)
+    # 배터리 값이 없는 업링크는 0이 아닌 null로 보존
+    battery = extract_battery(doc)
+    ts = parse_timestamp(telemetry["ts"] or telemetry["publishedAt"]) or parse_timestamp(doc.get("created_at"))
+    return {
+        "id": str(doc["_id"]),
+        "dev_eui": telemetry["dev_eui"],
+        "device_name": telemetry["device_name"],
+        "company": telemetry["company"],
+        "sensor_type": telemetry["sensor_type"],
+        "battery": int(battery) if battery is not None else None,
+        "longitude": float(telemetry["longitude"] or 0.0),
+        "latitude": float(telemetry["latitude"] or 0.0),
+        "ts": ts,
+    }
+
+
+def write_partition(dev_eui: str, day: datetime.date, part: str, rows: List[dict]) -> str:
+    """
+    한 디바이스/날짜 파티션에 part 파일 저장
+
+    part 이름은 내보내기 실행마다 달라 이전 파일을 덮어쓰지 않는다.
+    재시도로 같은 문서가 여러 part에 들어가도 조회 시 id 기준으로 중복 제거한다.
+    """
+    directory = _partition_dir(dev_eui, day)
+    os.makedirs(directory, exist_ok=True)
+
+    if _use_parquet():
+        path = os.path.join(directory, f"part-{part}.parquet")
+        tmp_path = path + ".tmp"
+        table = pa.Table.from_pylist(rows, schema=ARCHIVE_SCHEMA)
+        pq.write_table(table, tmp_path, compression="zstd")
+    else:
+        path = os.path.join(directory, f"part-{part}.ndjson.gz")
+        tmp_path = path + ".tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps({**row, "ts": row["ts"].isoformat()}) + "\n")
+
+    os.replace(tmp_path, path)
+    return path
+
+
+def _read_file(path: str, columns: Optional[List[str]] = None) -> List[dict]:
+    if path.endswith(".parquet"):
+        if pq is None:
+            logger.warning(f"pyarrow is not installed, skipping archive file: {path}")
+            return []
+        # Parquet는 필요한 컬럼만 읽음
+        return pq.read_table(path, columns=columns).to_pylist()
+
+    rows = []
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            row = json.loads(line)
+            if columns is not None:
+                row = {column: row[column] for column in columns}
+            row["ts"] = parse_timestamp(row["ts"])
+            rows.append(row)
+    return rows
+
+
+def _iter_partition_rows(
+    dev_eui: str,
+    start: datetime.datetime,
+    end: datetime.datetime,
+    columns: Optional[List[str]] = None,
+) -> Iterator[List[dict]]:
+    """최근 날짜부터 날짜 파티션별로 [start, end] 구간 행 반환"""
+    day = end.date()
+    while day >= start.date():
+        directory = _partition_dir(dev_eui, day)
+        rows = []
+        if os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                if name.endswith(".tmp"):
+                    continue
+                for row in _read_file(os.path.join(directory, name), columns):
+                    ts = parse_timestamp(row["ts"])
+                    if start <= ts <= end:
+                        row["ts"] = ts
+                        rows.append(row)
+        yield rows
+        day -= datetime.timedelta(days=1)
+
+
+def read_archived_keys(dev_eui: str, start: datetime.datetime, end: datetime.datetime) -> List[Tuple[datetime.datetime, str]]:
+    """
+    아카이브에서 디바이스의 [start, end] 구간 (ts, id) 목록 (ts 내림차순)
+
+    페이지 계산(전체 개수/순서)용으로 Parquet에서는 ts, id 컬럼만 읽는다.
+    """
+    keys = {}
+    for rows in _iter_partition_rows(dev_eui, parse_timestamp(start), parse_timestamp(end), ["id", "ts"]):
+        for row in rows:
+            keys[row["id"]] = row["ts"]
+    return sorted(((ts, row_id) for row_id, ts in keys.items()), reverse=True)
+
+
+def read_archived_messages(
+    dev_eui: str,
+    start: datetime.datetime,
+    end: datetime.datetime,
+    ids: Optional[Set[str]] = None,
+) -> List[dict]:
+    """
+    아카이브에서 디바이스의 [start, end] 구간 데이터 조회 (ts 내림차순)
+
+    ids가 있으면 해당 행만 반환하고, 모두 찾으면 나머지 파티션은 읽지 않는다.
+    파일 I/O가 있으므로 이벤트 루프에서는 asyncio.to_thread로 호출한다.
+    """
+    # 재시도 등으로 같은 문서가 여러 part에 있을 수 있으므로 id 기준 중복 제거
+    unique_rows = {}
+    for rows in _iter_partition_rows(dev_eui, parse_timestamp(start), parse_timestamp(end)):
+        for row in rows:
+            if ids is None or row["id"] in ids:
+                unique_rows[row["id"]] = row
+        if ids is not None and len(unique_rows) >= len(ids):
+            break
+    return sorted(unique_rows.values(), key=lambda row: row["ts"], reverse=True)
+
+
+def _export_field() -> str:
+    # time-series 컬렉션은 timeField(ts) 기준으로 만료되므로 ts 날짜 단위로 내보냄
+    return "ts" if is_timeseries_backend() else "created_at"
+
+
+def _export_key(day: datetime.date) -> str:
+    # 백엔드 전환 시 created_at 기준 기록/파일과 섞이지 않도록 ts 기준은 접두어를 붙임
+    return f"ts-{day.isoformat()}" if is_timeseries_backend() else day.isoformat()
+
+
+def _day_filter(day: datetime.date, since: Optional[datetime.datetime] = None) -> dict:
+    """내보내기 날짜 조건 (since가 있으면 그 이후 저장된 문서만)"""
+    day_start = datetime.datetime.combine(day, datetime.time.min, tzinfo=datetime.timezone.utc)
+    day_filter = {_export_field(): {"$gte": day_start, "$lt": day_start + datetime.timedelta(days=1)}}
+    if since is not None:
+        day_filter.setdefault("created_at", {})["$gt"] = since
+    return day_filter
+
+
+async def export_day(day: datetime.date, since: Optional[datetime.datetime] = None) -> int:
+    """
+    created_at(time-series는 ts) 기준 하루치 문서를 디바이스/날짜(ts) 파티션으로 내보내기
+
+    since가 있으면 이전 내보내기 이후 저장된(created_at > since) 문서만 새 part로 추가한다.
+    """
+    collection = hot_collection()
+    field = _export_field()
+    key = _export_key(day)
+    # 내보내는 동안 저장된 문서는 다음 실행에서 다시 확인하도록 시작 시각을 기록
+    started = datetime.datetime.now(datetime.timezone.utc)
+    part = f"{key}-{started.strftime('%Y%m%dT%H%M%S%f')}"
+
+    partitions: Dict[Tuple[str, datetime.date], List[dict]] = defaultdict(list)
+    buffered = 0
+    chunk = 0
+    count = 0
+
+    async def flush():
+        # part 이름은 내보낸 날짜 + 실행 시각 + chunk 번호
+        # created_at 기준이면 같은 ts 파티션에 여러 날의 export가 들어갈 수 있음
+        for (dev_eui, ts_day), rows in partitions.items():
+            await asyncio.to_thread(write_partition, dev_eui, ts_day, f"{part}-{chunk:04d}", rows)
+        partitions.clear()
+
+    cursor = collection.find(_day_filter(day, since))
+    async for doc in cursor:
+        row = _to_row(doc)
+        if not row["dev_eui"] or row["ts"] is None:
+            continue
+        partitions[(row["dev_eui"], row["ts"].date())].append(row)
+        buffered += 1
+        count += 1
+
+        # 하루치 전체를 메모리에 모으지 않도록 일정 행 수마다 파일로 내보냄
+        if buffered >= settings.ARCHIVE_CHUNK_ROWS:
+            await flush()
+            buffered = 0
+            chunk += 1
+
+    await flush()
+
+    await MongoDB.db.archive_state.update_one(
+        {"_id": key},
+        {
+            "$set": {
+                "format": "parquet" if _use_parquet() else "ndjson.gz",
+                "exported_at": started,
+            },
+            "$inc": {"count": count},
+        },
+        upsert=True
+    )
+    logger.info(f"Archived {count} messages ({field} on {day.isoformat()}{' late arrivals' if since else ''})")
+    return count
+
+
+async def export_pending_days() -> int:
+    """
+    아직 내보내지 않은 완료된 날짜(어제까지)를 모두 아카이브
+
+    공유 저장소가 아니거나 다른 레플리카가 lease를 가지고 있으면 실행하지 않는다.
+    """
+    if not archive_storage_ready():
+        return 0
+    if not await acquire_archive_lease():
+        logger.info("Archive lease is held by another replica, skipping export")
+        return 0
+
+    total = 0
+    for day, since in await pending_export_days():
+        # 오래 걸리는 내보내기 중 lease가 만료되지 않도록 날짜마다 갱신
+        if not await acquire_archive_lease():
+            logger.warning("Lost archive lease, stopping export")
+            break
+        total += await export_day(day, since)
+    return total
+
+
+async def pending_export_days() -> List[Tuple[datetime.date, Optional[datetime.datetime]]]:
+    """
+    내보내야 하는 완료된 날짜(어제까지)와 이전 내보내기 시각 목록
+
+    이미 내보낸 날짜라도 그 이후 저장된 문서가 있으면 다시 포함한다.
+    (time-series는 ts 날짜 기준이므로 일시 중지 후 밀린 메시지, 자정을 넘긴 지연 업링크,
+    보존 정책 적용 후 실행한 마이그레이션 문서가 이미 내보낸 날짜에 들어올 수 있음)
+    """
+    collection = hot_collection()
+    field = _export_field()
+
+    oldest = await collection.find_one({}, {field: 1}, sort=[(field, 1)])
+    if oldest is None or oldest.get(field) is None:
+        return []
+
+    exported_at = {
+        state["_id"]: state.get("exported_at")
+        async for state in MongoDB.db.archive_state.find({}, {"exported_at": 1})
+    }
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+
+    days = []
+    day = oldest[field].date()
+    while day < today:
+        key = _export_key(day)
+        if key not in exported_at:
+            days.append((day, None))
+        else:
+            since = exported_at[key]
+            if since is not None and await collection.find_one(_day_filter(day, since), {"_id": 1}) is not None:
+                days.append((day, since))
+        day += datetime.timedelta(days=1)
+    return days
+
+
+async def purge_archived() -> int:
+    """
+    보존 기간이 지났고 아카이브가 끝난 구간만 MongoDB에서 삭제
+
+    TTL 인덱스는 내보내기 실패/lease 상실/저장소 문제와 관계없이 계속 삭제하므로 사용하지 않고,
+    min(보존 기준 시각, 아직 내보내지 않은 첫 날짜) 이전만 직접 지운다.
+    """
+    if not archive_storage_ready():
+        return 0
+
+    purge_before = retention_cutoff()
+    pending = await pending_export_days()
+    if pending:
+        first_pending = datetime.datetime.combine(pending[0][0], datetime.time.min, tzinfo=datetime.timezone.utc)
+        purge_before = min(purge_before, first_pending)
+
+    result = await hot_collection().delete_many({_export_field(): {"$lt": purge_before}})
+    if stores_raw_separately():
+        await MongoDB.db[settings.RAW_COLLECTION].delete_many({"created_at": {"$lt": purge_before}})
+
+    if result.deleted_count:
+        logger.info(f"Purged {result.deleted_count} archived messages before {purge_before.isoformat()}")
+    return result.deleted_count
+
+
+async def run_retention_loop():
+    """
+    주기적으로 아카이브 후 내보낸 구간 삭제 (RETENTION_DAYS > 0 일 때만 실행)
+
+    모든 레플리카에서 실행되지만 lease를 가진 레플리카 하나만 실제 작업을 한다.
+    """
+    while True:
+        try:
+            if archive_storage_ready() and await acquire_archive_lease():
+                await export_pending_days()
+                await purge_archived()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Retention job failed: {e}")
+        await asyncio.sleep(settings.ARCHIVE_INTERVAL_SECONDS)
@@ -0,0 +1,91 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.core import metrics
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+def get_dedup_key(payload: dict) -> Optional[str]:
+    """
+    업링크 중복 판별 키 생성
+
+    ChirpStack의 deduplicationId가 있으면 그대로 사용하고,
+    없으면 devEUI + fCnt + time 조합을 사용한다.
+    """
+    uplink = payload.get("uplinkEvent") or {}
+
+    dedup_id = uplink.get("deduplicationId") or payload.get("deduplicationId")
+    if dedup_id:
+        return str(dedup_id)
+
+    dev_eui = payload.get("values", {}).get("devEUI") or uplink.get("deviceInfo", {}).get("devEui")
+    f_cnt = uplink.get("fCnt")
+    uplink_time = uplink.get("time")
+    if dev_eui and f_cnt is not None and uplink_time:
+        return f"{dev_eui}:{f_cnt}:{uplink_time}"
+
+    # 키를 만들 수 없으면 중복 제거하지 않음
+    return None
+
+
+class DedupCache:
+    """TTL이 있는 LRU 집합 - unique 인덱스 앞단의 빠른 중복 검사용"""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def seen(self, key: str) -> bool:
+        """키가 TTL 안에 이미 등록되어 있는지 확인"""
+        expires_at = self._entries.get(key)
+        if expires_at is None:
+            return False
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return False
+        self._entries.move_to_end(key)
+        return True
+
+    def add(self, key: str):
+        """키 등록 (가장 오래된 항목부터 제거)"""
+        self._entries[key] = time.monotonic() + self.ttl_seconds
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def discard(self, key: str):
+        """키 제거 (저장 실패로 예약을 취소할 때)"""
+        self._entries.pop(key, None)
+
+
+dedup_cache = DedupCache(settings.DEDUP_CACHE_SIZE, settings.DEDUP_CACHE_TTL_SECONDS)
+
+
+def record_cache_hit():
+    metrics.inc("dedup_cache_hits")
+    _update_hit_rate()
+
+
+def record_index_hit(count: int = 1):
+    metrics.inc("dedup_index_hits", count)
+    _update_hit_rate()
+
+
+def record_miss(count: int = 1):
+    metrics.inc("dedup_misses", count)
+    _update_hit_rate()
+
+
+def _update_hit_rate():
+    counters = metrics.snapshot()["counters"]
+    hits = counters.get("dedup_cache_hits", 0) + counters.get("dedup_index_hits", 0)
+    total = hits + counters.get("dedup_misses", 0)
+    metrics.set_gauge("dedup_hit_rate", hits / total if total else 0.0)
+    metrics.set_gauge("dedup_cache_size", len(dedup_cache))
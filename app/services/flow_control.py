@@ -0,0 +1,127 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from app.core import metrics
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+FLOW_NORMAL = "normal"
+FLOW_THROTTLED = "throttled"
+FLOW_PAUSED = "paused"
+
+# 저장 지연 EWMA 가중치
+LATENCY_SMOOTHING = 0.2
+
+
+class FlowController:
+    """
+    MongoDB 저장 지연과 처리 중 메시지 수에 따른 소비 속도 조절
+
+    - 지연이 높으면 prefetch를 절반으로 줄이고 (multiplicative decrease)
+    - 지연이 매우 높거나, 지연이 높은 채로 처리 중 메시지가 prefetch를 계속 가득 채우면 consumer를 일시 중지
+    - 정상으로 돌아오면 prefetch를 조금씩 늘려 회복한다 (additive increase)
+    """
+
+    def __init__(
+        self,
+        set_prefetch: Callable[[int], Awaitable[None]],
+        pause: Callable[[], Awaitable[None]],
+        resume: Callable[[], Awaitable[None]],
+    ):
+        self._set_prefetch = set_prefetch
+        self._pause = pause
+        self._resume = resume
+
+        self.state = FLOW_NORMAL
+        self.prefetch = settings.FLOW_PREFETCH_MAX
+        self.in_flight = 0
+        self.latency_ms = 0.0
+        # 포화(처리 중 메시지 >= prefetch) + 높은 지연이 연속으로 관측된 횟수
+        self.saturated_ticks = 0
+
+    @property
+    def is_paused(self) -> bool:
+        return self.state == FLOW_PAUSED
+
+    def on_start(self):
+        self.in_flight += 1
+
+    def on_finish(self, elapsed_seconds: float):
+        self.in_flight -= 1
+        elapsed_ms = elapsed_seconds * 1000
+        self.latency_ms += LATENCY_SMOOTHING * (elapsed_ms - self.latency_ms)
+
+    async def evaluate(self):
+        """현재 지연/처리 중 메시지 수로 상태 전환"""
+        slow = self.latency_ms >= settings.FLOW_LATENCY_HIGH_MS
+
+        # 처리 중 메시지 수는 channel QoS로 prefetch 이하로 제한되므로 현재 prefetch 대비 포화 여부로 판단
+        # 저장이 빠르면 가득 차 있어도 정상, 최소 prefetch에서는 더 줄일 것이 없으므로 제외
+        saturated = (
+            slow
+            and self.prefetch > settings.FLOW_PREFETCH_MIN
+            and self.in_flight >= self.prefetch
+        )
+        self.saturated_ticks = self.saturated_ticks + 1 if saturated else 0
+        overloaded = (
+            self.saturated_ticks >= settings.FLOW_SATURATION_TICKS
+            or self.latency_ms >= settings.FLOW_LATENCY_CRITICAL_MS
+        )
+
+        if self.state == FLOW_PAUSED:
+            # 처리 중 메시지가 충분히 빠지면 최소 prefetch로 재개
+            # (모두 빠졌으면 지연 값이 갱신되지 않으므로 재개해서 다시 측정)
+            drained = self.in_flight <= self.prefetch * settings.FLOW_RESUME_RATIO
+            if drained and (not slow or self.in_flight == 0):
+                # 이전 측정값으로 바로 다시 멈추지 않도록 지연 값을 high 기준으로 낮춰 재측정
+                self.latency_ms = min(self.latency_ms, settings.FLOW_LATENCY_HIGH_MS)
+                await self._change_prefetch(settings.FLOW_PREFETCH_MIN)
+                await self._resume()
+                self._change_state(FLOW_THROTTLED)
+        elif overloaded:
+            await self._pause()
+            self._change_state(FLOW_PAUSED)
+            self.saturated_ticks = 0
+        elif slow:
+            await self._change_prefetch(max(settings.FLOW_PREFETCH_MIN, self.prefetch // 2))
+            self._change_state(FLOW_THROTTLED)
+        elif self.prefetch < settings.FLOW_PREFETCH_MAX:
+            await self._change_prefetch(min(settings.FLOW_PREFETCH_MAX, self.prefetch + settings.FLOW_PREFETCH_STEP))
+            self._change_state(FLOW_NORMAL if self.prefetch >= settings.FLOW_PREFETCH_MAX else FLOW_THROTTLED)
+
+        self._update_metrics()
+
+    async def run(self):
+        """주기적으로 상태 평가"""
+        while True:
+            try:
+                await self.evaluate()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Flow control evaluation failed: {e}")
+            await asyncio.sleep(settings.FLOW_CHECK_INTERVAL_SECONDS)
+
+    async def _change_prefetch(self, prefetch: int):
+        if prefetch == self.prefetch:
+            return
+        logger.info(f"Adjusting prefetch: {self.prefetch} -> {prefetch} (latency {self.latency_ms:.0f}ms, in-flight {self.in_flight})")
+        await self._set_prefetch(prefetch)
+        self.prefetch = prefetch
+
+    def _change_state(self, state: str):
+        if state == self.state:
+            return
+        logger.warning(f"Flow control state: {self.state} -> {state} (latency {self.latency_ms:.0f}ms, in-flight {self.in_flight})")
+        metrics.inc(f"flow_{state}_transitions")
+        self.state = state
+
+    def _update_metrics(self):
+        metrics.set_gauge("flow_paused", 1 if self.is_paused else 0)
+        metrics.set_gauge("flow_throttled", 1 if self.state == FLOW_THROTTLED else 0)
+        metrics.set_gauge("flow_prefetch", self.prefetch)
+        metrics.set_gauge("flow_in_flight", self.in_flight)
+        metrics.set_gauge("flow_write_latency_ms", round(self.latency_ms, 1))
@@ -0,0 +1,199 @@
+import asyncio
+import datetime
+import heapq
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from app.core import metrics
+from app.core.config import get_settings
+from app.core.timeutils import parse_timestamp
+from app.services.message_service import latest_device_documents
+from app.services.storage_service import extract_battery, extract_telemetry
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+STATUS_ONLINE = "online"
+STATUS_OFFLINE = "offline"
+
+EVENT_ONLINE = "online"
+EVENT_OFFLINE = "offline"
+EVENT_LOW_BATTERY = "low_battery"
+EVENT_BATTERY_OK = "battery_ok"
+
+# 업링크 간격 추정 (EWMA) 가중치
+INTERVAL_SMOOTHING = 0.2
+# 타이머 루프 최대 대기 시간
+MAX_SLEEP_SECONDS = 60.0
+
+
+@dataclass
+class DeviceLiveness:
+    dev_eui: str
+    last_seen: datetime.datetime
+    expected_interval: float
+    battery: Optional[int] = None
+    status: str = STATUS_ONLINE
+    low_battery: bool = False
+    # heap 항목 무효화용 버전 (갱신될 때마다 증가)
+    version: int = 0
+
+    @property
+    def deadline(self) -> float:
+        return self.last_seen.timestamp() + self.expected_interval * settings.LIVENESS_OFFLINE_FACTOR
+
+
+class LivenessTracker:
+    """
+    디바이스 생존 상태 추적기
+
+    디바이스별 마지막 수신 시각과 예상 주기로 offline 기한을 계산해 min-heap에 넣고,
+    기한이 지난 항목만 꺼내 처리한다 (이벤트당 O(log n), 전체 스캔 없음).
+    갱신된 디바이스의 이전 heap 항목은 version으로 걸러낸다 (lazy deletion).
+
+    파드마다 하나씩 있고, 모든 파드가 모든 업링크 사본을 받으므로 상태는 레플리카 간에 같다.
+    전환 이벤트도 파드마다 발생하므로 SSE 구독자는 연결된 파드에서 한 번씩 받고,
+    devices_* 지표는 파드별 같은 값이므로 합산하지 않는다.
+    """
+
+    def __init__(self):
+        self.devices: Dict[str, DeviceLiveness] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._subscribers: Set[asyncio.Queue] = set()
+        self.recent_events: Deque[Dict[str, Any]] = deque(maxlen=settings.LIVENESS_EVENT_HISTORY)
+
+    def observe(self, dev_eui: str, seen_at: Any, battery: Optional[int] = None, emit: bool = True):
+        """업링크 수신 반영"""
+        seen_at = parse_timestamp(seen_at) or datetime.datetime.now(datetime.timezone.utc)
+        device = self.devices.get(dev_eui)
+
+        if device is None:
+            device = DeviceLiveness(
+                dev_eui=dev_eui,
+                last_seen=seen_at,
+                expected_interval=float(settings.LIVENESS_DEFAULT_INTERVAL_SECONDS),
+            )
+            self.devices[dev_eui] = device
+        else:
+            # 늦게 도착한(재전송 등) 업링크로 시각이 되돌아가지 않도록
+            if seen_at <= device.last_seen:
+                seen_at = device.last_seen
+            elif device.status == STATUS_ONLINE:
+                gap = (seen_at - device.last_seen).total_seconds()
+                device.expected_interval += INTERVAL_SMOOTHING * (gap - device.expected_interval)
+            device.last_seen = seen_at
+
+            if device.status == STATUS_OFFLINE:
+                device.status = STATUS_ONLINE
+                if emit:
+                    self._emit(EVENT_ONLINE, device)
+
+        if battery is not None:
+            device.battery = battery
+            low_battery = battery < settings.LOW_BATTERY_THRESHOLD
+            if low_battery != device.low_battery:
+                device.low_battery = low_battery
+                if emit:
+                    self._emit(EVENT_LOW_BATTERY if low_battery else EVENT_BATTERY_OK, device)
+
+        device.version += 1
+        heapq.heappush(self._heap, (device.deadline, device.version, dev_eui))
+
+        # 무효 항목이 너무 많이 쌓이면 현재 항목만으로 heap 재구성
+        if len(self._heap) > 2 * len(self.devices) + 1024:
+            self._heap = [(d.deadline, d.version, d.dev_eui) for d in self.devices.values()
+                          if d.status == STATUS_ONLINE]
+            heapq.heapify(self._heap)
+
+    def check(self, now: Optional[datetime.datetime] = None) -> int:
+        """기한이 지난 디바이스를 offline 처리하고 처리 수 반환"""
+        now_ts = (now or datetime.datetime.now(datetime.timezone.utc)).timestamp()
+        expired = 0
+
+        while self._heap and self._heap[0][0] <= now_ts:
+            _, version, dev_eui = heapq.heappop(self._heap)
+            device = self.devices.get(dev_eui)
+            if device is None or device.version != version or device.status == STATUS_OFFLINE:
+                continue
+            device.status = STATUS_OFFLINE
+            self._emit(EVENT_OFFLINE, device)
+            expired += 1
+
+        self._update_metrics()
+        return expired
+
+    def seconds_until_next_deadline(self) -> Optional[float]:
+        if not self._heap:
+            return None
+        return self._heap[0][0] - datetime.datetime.now(datetime.timezone.utc).timestamp()
+
+    def statuses(self) -> List[DeviceLiveness]:
+        return sorted(self.devices.values(), key=lambda device: device.dev_eui)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=settings.LIVENESS_EVENT_HISTORY)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def _emit(self, event_type: str, device: DeviceLiveness):
+        event = {
+            "type": event_type,
+            "dev_eui": device.dev_eui,
+            "last_seen": device.last_seen.isoformat(),
+            "battery": device.battery,
+            "at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        }
+        logger.info(f"Device status changed: {event}")
+        metrics.inc(f"liveness_{event_type}_events")
+        self.recent_events.append(event)
+
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # 느린 구독자는 이벤트를 놓침 (recent_events로 재조회 가능)
+                logger.warning("Liveness event queue full, dropping event")
+
+    def _update_metrics(self):
+        offline = sum(1 for device in self.devices.values() if device.status == STATUS_OFFLINE)
+        metrics.set_gauge("devices_offline", offline)
+        metrics.set_gauge("devices_online", len(self.devices) - offline)
+        metrics.set_gauge("devices_low_battery", sum(1 for device in self.devices.values() if device.low_battery))
+
+
+liveness_tracker = LivenessTracker()
+
+
+async def rehydrate_liveness():
+    """시작 시 디바이스별 최신 데이터로 상태 복원"""
+    count = 0
+    async for doc in latest_device_documents():
+        telemetry = extract_telemetry(doc)
+        if not telemetry["dev_eui"] or telemetry["ts"] is None:
+            continue
+        # 배터리 값이 없는 디바이스는 None으로 넘겨 배터리 부족으로 판정하지 않음
+        liveness_tracker.observe(telemetry["dev_eui"], telemetry["ts"], extract_battery(doc), emit=False)
+        count += 1
+
+    # 복원 직후 이미 기한이 지난 디바이스는 offline으로 전환
+    liveness_tracker.check()
+    logger.info(f"Liveness tracker rehydrated: {count} devices")
+
+
+async def run_liveness_loop():
+    """다음 offline 기한까지 대기 후 만료 처리"""
+    while True:
+        try:
+            liveness_tracker.check()
+        except Exception as e:
+            logger.error(f"Liveness check failed: {e}")
+
+        wait = liveness_tracker.seconds_until_next_deadline()
+        if wait is None or wait > MAX_SLEEP_SECONDS:
+            wait = MAX_SLEEP_SECONDS
+        await asyncio.sleep(max(wait, 0.0) + 0.01)
@@ -1,16 +1,89 @@
+import asyncio
 import datetime
+import heapq
+import itertools
 import json
-import re
 from app.schemas.message import AllDevEUIResponse
 import logging
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from app.core.timeutils import extract_canonical_ts, parse_timestamp
+from app.db.mongodb import logger
+from app.services.archive_service import read_archived_keys, read_archived_messages, retention_cutoff
+from app.services.storage_service import (
+    build_telemetry_document, build_timeseries_document, delete_raw_event, dev_eui_filter,
+    extract_telemetry, hot_collection, is_slim_mode, is_timeseries_backend, save_raw_event,
+    stores_raw_separately
+)
+from app.services.dedup_service import dedup_cache, get_dedup_key, record_cache_hit, record_index_hit, record_miss
+from app.schemas.message import KST, MessageResponse, MessageQuery, MessageDevEUIResponse
+
+
+# 일반 컬렉션(full/slim 문서)의 디바이스별 최신 문서 파이프라인
+LATEST_PER_DEVICE_PIPELINE = [
+    # devEUI 필드가 존재하는 문서만 필터링 (full/slim)
+    {"$match": {"$or": [
+        {"content.values.devEUI": {"$exists": True}},
+        {"devEUI": {"$exists": True}}
+    ]}},
+
+    # 대표 시각(ts) 기준으로 정렬 (최신순)
+    {"$sort": {"ts": -1}},
+
+    # devEUI 기준으로 그룹화하고 첫 번째 문서(최신)만 유지
+    {"$group": {
+        "_id": {"$ifNull": ["$content.values.devEUI", "$devEUI"]},
+        "doc": {"$first": "$$ROOT"}
+    }},
+
+    # 원래 문서 구조로 변환
+    {"$replaceRoot": {"newRoot": "$doc"}}
+]
+
+# time-series 컬렉션: (meta.devEUI, ts) 인덱스를 타는 디바이스별 최신값(last point) 조회
+TIMESERIES_LATEST_PIPELINE = [
+    {"$sort": {"meta.devEUI": 1, "ts": -1}},
+    {"$group": {
+        "_id": "$meta.devEUI",
+        "doc": {"$first": "$$ROOT"}
+    }},
+    {"$replaceRoot": {"newRoot": "$doc"}}
+]
+
+# datetime으로 변환할 날짜 필드
+DATE_FIELDS = ("publishedAt", "time", "nsTime")
+
+
+def convert_date_fields(obj):
+    """publishedAt, time, nsTime 문자열 필드를 UTC datetime으로 변환 (재귀)"""
+    if isinstance(obj, dict):
+        for key, value in list(obj.items()):
+            if key in DATE_FIELDS and isinstance(value, str):
+                date_obj = parse_timestamp(value)
+                if date_obj is not None:
+                    obj[key] = date_obj
+                else:
+                    print(f"날짜 변환 실패 ({key}={value})")
+
+            # 재귀 처리
+            elif isinstance(value, dict) or isinstance(value, list):
+                convert_date_fields(value)
+
+    elif isinstance(obj, list):
+        for item in obj:
+            convert_date_fields(item)
+
+
+async def create_message(message_data) -> Optional[MessageResponse]:
+    """
+    Create a new message in the database
 
-from app.db.mongodb import MongoDB, logger
-from app.schemas.message import MessageResponse, MessageQuery, MessageDevEUIResponse
-
-
-async def create_message(message_data):
-    """Create a new message in the database"""
-    collection = MongoDB.db.messages
+    재전송/다중 게이트웨이로 인한 중복 업링크는 저장하지 않고 None 반환
+    """
+    collection = hot_collection()
 
     # 내용을 객체로 변환 (문자열인 경우)
     if isinstance(message_data.content, str):
@@ -18,41 +91,17 @@ async def create_message(message_data):
     else:
         content_data = message_data.content.copy()
 
-    # 날짜 정규식 패턴 - "2025-04-28T02:44:39.559014059Z" 같은 형식
-
-    date_pattern = re.compile(r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d+Z$')
-
-    # 날짜 필드 변환 함수
-    def convert_date_fields(obj):
-        if isinstance(obj, dict):
-            for key, value in list(obj.items()):
-                # publishedAt, time, nsTime 등의 필드에 대해
-                if key in ["publishedAt", "time", "nsTime"] and isinstance(value, str):
-                    if date_pattern.match(value):
-                        try:
-                            # 날짜 부분과 시간 부분 추출
-                            date_part = value[:10]  # "2025-04-28"
-                            time_part = value[11:19]  # "02:44:39"
-
-                            # 날짜 객체 생성
-                            date_obj = datetime.datetime.strptime(
-                                f"{date_part} {time_part}",
-                                "%Y-%m-%d %H:%M:%S"
-                            )
-
-                            # MongoDB에서는 aware datetime을 권장
-                            date_obj = date_obj.replace(tzinfo=datetime.timezone.utc)
-                            obj[key] = date_obj
-                        except Exception as e:
-                            print(f"날짜 변환 실패 ({key}={value}): {e}")
-
-                # 재귀 처리
-                elif isinstance(value, dict) or isinstance(value, list):
-                    convert_date_fields(value)
-
-        elif isinstance(obj, list):
-            for item in obj:
-                convert_date_fields(item)
+    # 날짜 변환 전 원본 값으로 중복 키 생성
+    dedup_key = get_dedup_key(content_data)
+    if dedup_key and dedup_cache.seen(dedup_key):
+        record_cache_hit()
+        logger.info(f"Duplicate uplink skipped (cache): {dedup_key}")
+        return None
+
+    # 저장을 기다리는 동안 같은 업링크가 동시에 들어와도 통과하지 않도록 await 전에 키를 먼저 등록
+    # (time-series 컬렉션은 unique 인덱스가 없어 캐시가 유일한 중복 검사)
+    if dedup_key:
+        dedup_cache.add(dedup_key)
 
     # 날짜 필드 변환
     try:
@@ -60,105 +109,130 @@ async def create_message(message_data):
     except Exception as e:
         print(f"전체 변환 실패: {e}")
 
-    message_dict = {
-        "content": content_data,
-        "routing_key": message_data.routing_key,
-        "created_at": datetime.datetime.now(datetime.timezone.utc)
-    }
+    created_at = datetime.datetime.now(datetime.timezone.utc)
+
+    # slim 모드/time-series 백엔드: hot 컬렉션에는 조회용 필드만, 원본은 raw 컬렉션에 압축 저장
+    if is_timeseries_backend():
+        message_dict = build_timeseries_document(build_telemetry_document(content_data))
+    elif is_slim_mode():
+        message_dict = build_telemetry_document(content_data)
+    else:
+        message_dict = {"content": content_data}
+
+    message_dict["routing_key"] = message_data.routing_key
+    message_dict["created_at"] = created_at
+    # 모든 조회/정렬이 사용하는 대표 시각 (UTC datetime)
+    message_dict["ts"] = extract_canonical_ts(content_data) or created_at
+    if dedup_key:
+        message_dict["dedup_key"] = dedup_key
 
-    # MongoDB에 저장
-    result = await collection.insert_one(message_dict)
-    created_message = await collection.find_one({"_id": result.inserted_id})
+    # hot 문서와 raw 문서가 같은 _id를 쓰도록 미리 생성
+    message_id = ObjectId()
+    message_dict["_id"] = message_id
+
+    raw_saved = False
+    try:
+        # 원본 이벤트를 먼저 저장 - hot 문서만 남고 원본이 유실되는 일이 없도록
+        if stores_raw_separately():
+            await save_raw_event(message_id, content_data, created_at)
+            raw_saved = True
+
+        # MongoDB에 저장 (unique 인덱스가 다른 파드/재시작 이후의 중복을 걸러냄)
+        await collection.insert_one(message_dict)
+    except DuplicateKeyError:
+        if raw_saved:
+            await delete_raw_event(message_id)
+        record_index_hit()
+        logger.info(f"Duplicate uplink skipped (index): {dedup_key}")
+        return None
+    except Exception:
+        if raw_saved:
+            await delete_raw_event(message_id)
+        # 저장 실패 후 재전달된 메시지가 중복으로 버려지지 않도록 예약한 키 해제
+        if dedup_key:
+            dedup_cache.discard(dedup_key)
+        raise
+
+    record_miss()
 
     # 응답 데이터 준비
     response_data = {
-        "id": str(created_message.pop("_id")),
-        "content": created_message.get("content"),
-        "routing_key": created_message.get("routing_key"),
-        "created_at": created_message.get("created_at")
+        "id": str(message_id),
+        "content": content_data,
+        "routing_key": message_data.routing_key,
+        "created_at": created_at
     }
 
     return MessageResponse(**response_data)
 
 async def get_all_dev_euis():
     """Get all device EUI IDs"""
-    collection = MongoDB.db.messages
+    collection = hot_collection()
+
+    if is_timeseries_backend():
+        dev_euis = await collection.distinct("meta.devEUI")
+        dev_euis.sort()
+        return dev_euis
 
-    dev_euis = await collection.distinct("content.values.devEUI")
+    # full/slim 문서의 devEUI 합집합
+    dev_euis = set(await collection.distinct("content.values.devEUI"))
+    dev_euis.update(await collection.distinct("devEUI"))
+    dev_euis = [dev_eui for dev_eui in dev_euis if dev_eui]
 
     dev_euis.sort()
     return dev_euis
 
-async def get_all_devices_latest_data():
-    """Get the latest data for all devices"""
-    collection = MongoDB.db.messages
+def latest_device_documents():
+    """디바이스별 최신 문서 커서 (저장 형식 그대로)"""
+    collection = hot_collection()
 
     # MongoDB Aggregation 파이프라인
-    pipeline = [
-        # content.values.devEUI 필드가 존재하는 문서만 필터링
-        {"$match": {"content.values.devEUI": {"$exists": True}}},
-
-        # content.publishedAt 기준으로 정렬 (최신순)
-        {"$sort": {"content.values.publishedAt": -1}},
+    if is_timeseries_backend():
+        pipeline = TIMESERIES_LATEST_PIPELINE
+    else:
+        pipeline = LATEST_PER_DEVICE_PIPELINE
 
-        # devEUI 기준으로 그룹화하고 첫 번째 문서(최신)만 유지
-        {"$group": {
-            "_id": "$content.values.devEUI",
-            "doc": {"$first": "$$ROOT"}
-        }},
+    return collection.aggregate(pipeline)
 
-        # 원래 문서 구조로 변환
-        {"$replaceRoot": {"newRoot": "$doc"}}
-    ]
 
-    cursor = collection.aggregate(pipeline)
+async def get_all_devices_latest_data():
+    """Get the latest data for all devices"""
+    cursor = latest_device_documents()
 
     result = []
 
     async for doc in cursor:
         try:
-            content = doc.get("content", {})
-            values = content.get("values", {})
-
-            # 요구되는 필드 추출 시 None 값에 대한 처리 추가
-            dev_eui = values.get("devEUI", "")
+            telemetry = extract_telemetry(doc)
 
             # 필수 필드인 dev_eui가 비어있으면 건너뛰기
-            if not dev_eui:
+            if not telemetry["dev_eui"]:
                 continue
 
             # AllDevEUIResponse 객체 생성
-            device_info = content.get("uplinkEvent", {}).get("deviceInfo", {})
-            tags = device_info.get("tags", {})
-
-            logger.info(f"dev_eui: {dev_eui}")
-            logger.info(f"device_info: {device_info}")
-            logger.info(f"values: {values}")
-            logger.info(f"tags: {tags}")
-
             device_data = {
-                "dev_eui": dev_eui,
-                "device_name": device_info.get("deviceName", ""),
-                "company": tags.get("company", ""),
-                "sensor_type": tags.get("type", ""),
-                "battery": values.get("batteryLevel", 0),
-                "longitude": values.get("longitude", 0.0),
-                "latitude": values.get("latitude", 0.0),
-                "publishedAt": values.get("publishedAt", None)  # None 가능
+                "dev_eui": telemetry["dev_eui"],
+                "device_name": telemetry["device_name"],
+                "company": telemetry["company"],
+                "sensor_type": telemetry["sensor_type"],
+                "battery": telemetry["battery"],
+                "longitude": telemetry["longitude"],
+                "latitude": telemetry["latitude"],
+                "publishedAt": telemetry["ts"]  # None 가능
             }
 
             # 유효한 데이터만 추가
             device = AllDevEUIResponse(**device_data)
             result.append(device)
         except Exception as e:
-            logging.error(f"데이터 변환 중 오류 (device: {values.get('devEUI', 'unknown')}): {e}")
+            logging.error(f"데이터 변환 중 오류 (device: {doc.get('_id', 'unknown')}): {e}")
             continue
 
     return result
 
 async def get_messages(query: MessageQuery):
     """Get messages from MongoDB"""
-    collection = MongoDB.db.messages
+    collection = hot_collection()
 
     filter_condition = {}
 
@@ -166,7 +240,7 @@ async def get_messages(query: MessageQuery):
         filter_condition["routing_key"] = query.routing_key
 
     if query.dev_eui:
-        filter_condition["content.values.devEUI"] = query.dev_eui
+        filter_condition.update(dev_eui_filter(query.dev_eui))
 
     date_filter = {}
     if query.start_date:
@@ -175,7 +249,7 @@ async def get_messages(query: MessageQuery):
         date_filter["$lte"] = query.end_date
 
     if date_filter:
-        filter_condition["content.publishedAt"] = date_filter
+        filter_condition["ts"] = date_filter
 
     # 정렬 조건
     sort_condition = [(query.sort_by, query.sort_order)]
@@ -195,6 +269,9 @@ async def get_messages(query: MessageQuery):
     items = []
     async for doc in cursor:
         doc["id"] = str(doc.pop("_id"))
+        if "content" not in doc:
+            # slim 문서는 조회용 필드를 content로 반환 (원본은 raw 엔드포인트)
+            doc["content"] = extract_telemetry(doc)
         items.append(MessageResponse(**doc))
 
     # 페이지네이션 응답 구성
@@ -206,11 +283,51 @@ async def get_messages(query: MessageQuery):
         "total_pages": (total + query.page_size - 1) // query.page_size
     }
 
+async def get_old_page(collection, old_filter: dict, archive_keys: List[Tuple[datetime.datetime, str]],
+                       dev_eui: str, skip: int, limit: int) -> List[dict]:
+    """
+    보존 기간 이전 구간의 한 페이지 (MongoDB 문서와 아카이브 행을 ts 내림차순으로 병합)
+
+    MongoDB에서는 skip + limit개의 (ts, _id)만, 아카이브에서는 페이지에 포함된 행이 있는 날짜만 읽는다.
+    """
+    needed = skip + limit
+    cursor = collection.find(old_filter, {"ts": 1}).sort("ts", -1).limit(needed)
+    live_keys = [(parse_timestamp(doc["ts"]), str(doc["_id"]), True) async for doc in cursor]
+    archived_keys = [(ts, row_id, False) for ts, row_id in archive_keys]
+
+    merged = heapq.merge(live_keys, archived_keys, key=lambda key: key[0], reverse=True)
+    page = list(itertools.islice(merged, skip, needed))
+
+    live_ids = [ObjectId(row_id) for _, row_id, live in page if live]
+    docs = {}
+    if live_ids:
+        docs = {str(doc["_id"]): doc async for doc in collection.find({"_id": {"$in": live_ids}})}
+
+    archived_page = [(ts, row_id) for ts, row_id, live in page if not live]
+    rows = {}
+    if archived_page:
+        rows = {
+            row["id"]: row
+            for row in await asyncio.to_thread(
+                read_archived_messages, dev_eui,
+                min(ts for ts, _ in archived_page), max(ts for ts, _ in archived_page),
+                {row_id for _, row_id in archived_page}
+            )
+        }
+
+    telemetry_list = []
+    for _, row_id, live in page:
+        if live and row_id in docs:
+            telemetry_list.append(extract_telemetry(docs[row_id]))
+        elif not live and row_id in rows:
+            telemetry_list.append(rows[row_id])
+    return telemetry_list
+
 async def get_messages_by_dev_eui(query: MessageQuery):
     """
     특정 필드만 추출하여 메시지 조회
     """
-    collection = MongoDB.db.messages
+    collection = hot_collection()
 
     # 필터 조건 구성
     filter_condition = {}
@@ -221,7 +338,7 @@ async def get_messages_by_dev_eui(query: MessageQuery):
 
     # devEUI로 필터링
     if query.dev_eui:
-        filter_condition["content.values.devEUI"] = query.dev_eui
+        filter_condition.update(dev_eui_filter(query.dev_eui))
 
     # 날짜 범위로 필터링
     date_filter = {}
@@ -230,17 +347,41 @@ async def get_messages_by_dev_eui(query: MessageQuery):
     if query.end_date:
         date_filter["$lte"] = query.end_date
 
+    # 보존 기간 이전 구간은 아카이브 파일 + 아직 MongoDB에 남아 있는 문서를 합쳐서 조회
+    old_filter = None
+    old_total = 0
+    archive_keys = []
+    cutoff = retention_cutoff()
+    if query.dev_eui and cutoff and query.start_date and query.start_date < cutoff:
+        # 삭제 전이거나 아직 내보내지 않은 문서 (ts는 오래됐지만 created_at이 최근인 경우 등)
+        old_date_filter = {"$gte": query.start_date, "$lt": cutoff}
+        if query.end_date:
+            old_date_filter["$lte"] = query.end_date
+        old_filter = {**filter_condition, "ts": old_date_filter}
+        old_total = await collection.count_documents(old_filter)
+
+        # 아카이브는 (ts, id)만 읽어 개수/순서 계산, MongoDB에 남아 있는 문서는 MongoDB 쪽을 사용
+        archive_end = min(query.end_date, cutoff) if query.end_date else cutoff
+        archive_keys = await asyncio.to_thread(read_archived_keys, query.dev_eui, query.start_date, archive_end)
+        if archive_keys:
+            live_ids = {str(doc["_id"]) async for doc in collection.find(old_filter, {"_id": 1})}
+            archive_keys = [(ts, row_id) for ts, row_id in archive_keys if ts < cutoff and row_id not in live_ids]
+
+        # 보존 기간 이후 구간만 MongoDB에서 페이지 단위로 조회
+        date_filter["$gte"] = cutoff
+
     if date_filter:
-        filter_condition["content.values.publishedAt"] = date_filter
+        filter_condition["ts"] = date_filter
 
     # 정렬 조건
-    sort_condition = [("content.values.publishedAt", -1)]
+    sort_condition = [("ts", -1)]
 
     # 페이지네이션 계산
     skip = (query.page - 1) * query.page_size
 
     # 전체 문서 수 계산
-    total = await collection.count_documents(filter_condition)
+    live_total = await collection.count_documents(filter_condition)
+    total = live_total + old_total + len(archive_keys)
 
     # 문서 조회 (필요한 필드만 선택)
     cursor = collection.find(filter_condition)
@@ -248,75 +389,53 @@ async def get_messages_by_dev_eui(query: MessageQuery):
     cursor.skip(skip)
     cursor.limit(query.page_size)
 
+    telemetry_list = [extract_telemetry(doc) async for doc in cursor]
+
+    # 최신 데이터(MongoDB) 뒤에 보존 기간 이전 데이터가 이어지도록 페이지 채우기
+    remaining = query.page_size - len(telemetry_list)
+    if old_filter is not None and remaining > 0:
+        old_skip = max(0, skip - live_total)
+        telemetry_list.extend(
+            await get_old_page(collection, old_filter, archive_keys, query.dev_eui, old_skip, remaining)
+        )
+
     items = []
     info = None
 
-    async for doc in cursor:
+    for telemetry in telemetry_list:
         try:
-            # 필요한 필드 추출
-            content = doc.get("content", {})
-            values = content.get("values", {})
 
-            logger.info(f"values: {values}")
-
-            # 원본 publishedAt 값 (데이터베이스에 저장된 그대로)
-            original_published_at = values.get("publishedAt", datetime.datetime.now())
+            # 대표 시각 (ts 백필 전 문서는 원본 publishedAt 변환)
+            published_at = telemetry["ts"] or parse_timestamp(telemetry.get("publishedAt"))
+            if published_at is None:
+                continue
+            if published_at.tzinfo is None:
+                published_at = published_at.replace(tzinfo=datetime.timezone.utc)
 
             # KST 문자열 생성
-            kst_dt = None
-            if isinstance(original_published_at, str):
-                # 문자열 형식 확인 및 처리
-                try:
-                    if "+09:00" in original_published_at:  # 이미 KST
-                        kst_dt = datetime.datetime.fromisoformat(original_published_at)
-                    elif "Z" in original_published_at:  # UTC with Z
-                        utc_dt = datetime.datetime.fromisoformat(original_published_at.replace('Z', '+00:00'))
-                        kst_dt = utc_dt + datetime.timedelta(hours=9)
-                    elif "+" in original_published_at or "-" in original_published_at:  # 다른 시간대
-                        dt = datetime.datetime.fromisoformat(original_published_at)
-                        # 시간대 정보 제거 후 UTC로 간주하고 KST로 변환
-                        utc_dt = dt.replace(tzinfo=None)
-                        kst_dt = utc_dt + datetime.timedelta(hours=9)
-                    else:  # 시간대 정보 없음
-                        utc_dt = datetime.datetime.fromisoformat(original_published_at)
-                        kst_dt = utc_dt + datetime.timedelta(hours=9)
-                except ValueError:
-                    # 다른 형식인 경우 기본 파싱 시도
-                    try:
-                        utc_dt = datetime.datetime.strptime(original_published_at, "%Y-%m-%dT%H:%M:%S")
-                        kst_dt = utc_dt + datetime.timedelta(hours=9)
-                    except ValueError:
-                        kst_dt = datetime.datetime.now()  # 파싱 실패 시 현재 시간
-            else:
-                # datetime 객체인 경우 UTC로 간주
-                kst_dt = original_published_at + datetime.timedelta(hours=9)
-
-                # KST 문자열 생성
-            kst_str = kst_dt.strftime("%Y-%m-%d %H:%M:%S KST")
-
-            # 원본 형식 그대로 유지 (데이터베이스에 있는 형식)
-            original_format = original_published_at
+            kst_str = published_at.astimezone(KST).strftime("%Y-%m-%d %H:%M:%S KST")
 
             # MessageDevEUIResponse 객체 생성
             message_data = {
-                "battery": values.get("batteryLevel", 0),
-                "longitude": values.get("longitude", 0.0),
-                "latitude": values.get("latitude", 0.0),
-                "publishedAt": original_format,  # 원본 형식 유지
+                # 아카이브 행은 배터리 값이 없으면 None
+                "battery": telemetry["battery"] or 0,
+                "longitude": telemetry["longitude"],
+                "latitude": telemetry["latitude"],
+                "publishedAt": published_at,
             }
 
             items.append(MessageDevEUIResponse(**message_data))
 
             if info is None:
                 info = {
-                    "dev_eui": values.get("devEUI", ""),
-                    "device_name": content.get("uplinkEvent", {}).get("deviceInfo", {}).get("deviceName", ""),
-                    "company": content.get("uplinkEvent", {}).get("deviceInfo", {}).get("tags", {}).get("company",""),
-                    "sensor_type": content.get("uplinkEvent", None).get("deviceInfo", {}).get("tags", {}).get("type",""),
-                    "battery": values.get("batteryLevel", 0),
-                    "longitude": values.get("longitude", 0.0),
-                    "latitude": values.get("latitude", 0.0),
-                    "publishedAt": original_format,
+                    "dev_eui": telemetry["dev_eui"],
+                    "device_name": telemetry["device_name"],
+                    "company": telemetry["company"],
+                    "sensor_type": telemetry["sensor_type"],
+                    "battery": telemetry["battery"] or 0,
+                    "longitude": telemetry["longitude"],
+                    "latitude": telemetry["latitude"],
+                    "publishedAt": published_at,
                     "published_at_kst": kst_str
                 }
 
@@ -1,11 +1,14 @@
+import asyncio
 import json
 import logging
+import time
 from typing import Callable, Any
 
 import aio_pika
 from aio_pika.abc import AbstractIncomingMessage
 
 from app.core.config import get_settings
+from app.services.flow_control import FlowController
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -16,6 +19,10 @@ class RabbitMQService:
         self.channel = None
         self.exchange = None
         self.queue = None
+        self.consumer_tag = None
+        self._callback = None
+        self._flow_task = None
+        self.flow = FlowController(self.set_prefetch, self.pause, self.resume)
 
     async def connect(self):
         """Establish connection to RabbitMQ server."""
@@ -23,6 +30,9 @@ class RabbitMQService:
         self.connection = await aio_pika.connect_robust(settings.RABBITMQ_URL)
         self.channel = await self.connection.channel()
 
+        # 미확인(unacked) 메시지 수 제한 - 처리 중 코루틴이 무한히 쌓이지 않도록
+        await self.channel.set_qos(prefetch_count=self.flow.prefetch, global_=True)
+
         # Declare queue
         self.exchange = await self.channel.declare_exchange(
             settings.RABBITMQ_EXCHANGE,
@@ -42,23 +52,76 @@ class RabbitMQService:
 
         logger.info(f"Connected to RabbitMQ, queue: {settings.RABBITMQ_QUEUE}")
 
+    async def observe(self, callback: Callable[[dict], Any]):
+        """
+        이 파드 전용 임시 큐로 모든 메시지의 사본 수신
+
+        작업 큐는 레플리카끼리 round-robin으로 나눠 받으므로, 디바이스 생존 상태처럼
+        모든 파드가 전체 업링크를 봐야 하는 용도는 같은 exchange/routing key에 exclusive 큐를 바인딩한다.
+        흐름 제어(prefetch/일시 중지)의 영향을 받지 않도록 별도 채널에서 no_ack로 소비하고,
+        처리가 밀리면 오래된 사본부터 버린다.
+        """
+        channel = await self.connection.channel()
+        exchange = await channel.get_exchange(settings.RABBITMQ_EXCHANGE)
+        queue = await channel.declare_queue(
+            exclusive=True,
+            auto_delete=True,
+            arguments={
+                "x-max-length": settings.LIVENESS_QUEUE_MAX_LENGTH,
+                "x-overflow": "drop-head",
+            }
+        )
+        await queue.bind(exchange=exchange, routing_key=settings.RABBITMQ_ROUTING_KEY)
+
+        async def observe_message(message: AbstractIncomingMessage):
+            try:
+                await callback(json.loads(message.body.decode()))
+            except Exception as e:
+                logger.error(f"Error observing message: {e}")
+
+        await queue.consume(observe_message, no_ack=True)
+        logger.info("Started observing message copies.")
+
     async def close(self):
         """Close connection to RabbitMQ server."""
+        if self._flow_task:
+            self._flow_task.cancel()
         if self.connection:
             await self.connection.close()
 
+    async def set_prefetch(self, prefetch_count: int):
+        """Change the channel prefetch (applies to the running consumer)."""
+        await self.channel.set_qos(prefetch_count=prefetch_count, global_=True)
+
+    async def pause(self):
+        """Stop receiving new deliveries; in-flight messages are still acked."""
+        if self.consumer_tag:
+            await self.queue.cancel(self.consumer_tag)
+            self.consumer_tag = None
+            logger.warning("Paused consuming messages.")
+
+    async def resume(self):
+        """Start receiving deliveries again after a pause."""
+        if self.consumer_tag is None and self._callback is not None:
+            self.consumer_tag = await self.queue.consume(self._callback)
+            logger.info("Resumed consuming messages.")
+
     async def consume(self, callback: Callable[[dict], Any]):
         """Start consuming messages"""
         async def process_message(message: AbstractIncomingMessage):
             async with message.process():
+                self.flow.on_start()
+                started = time.monotonic()
                 try:
                     payload = json.loads(message.body.decode())
                     logger.info(f"Received message: {payload}")
                     await callback(payload)
                 except Exception as e:
                     logger.error(f"Error processing message: {e}")
+                finally:
+                    self.flow.on_finish(time.monotonic() - started)
 
-        await self.queue.consume(process_message)
+        self._callback = process_message
+        self.consumer_tag = await self.queue.consume(process_message)
+        self._flow_task = asyncio.create_task(self.flow.run())
         logger.info("Started consuming messages.")
-
-
@@ -0,0 +1,188 @@
+import datetime
+from typing import Any, Dict, Optional
+
+import bson
+import zstandard
+from bson import Binary, ObjectId
+
+from app.core.config import get_settings
+from app.db.mongodb import MongoDB
+
+settings = get_settings()
+
+STORAGE_MODE_FULL = "full"
+STORAGE_MODE_SLIM = "slim"
+
+STORAGE_BACKEND_COLLECTION = "collection"
+STORAGE_BACKEND_TIMESERIES = "timeseries"
+
+RAW_CODEC = "zstd"
+
+_compressor = zstandard.ZstdCompressor(level=settings.RAW_COMPRESSION_LEVEL)
+_decompressor = zstandard.ZstdDecompressor()
+
+
+def is_slim_mode() -> bool:
+    return settings.STORAGE_MODE == STORAGE_MODE_SLIM
+
+
+def is_timeseries_backend() -> bool:
+    return settings.STORAGE_BACKEND == STORAGE_BACKEND_TIMESERIES
+
+
+def stores_raw_separately() -> bool:
+    """원본 이벤트를 raw 컬렉션에 따로 저장하는지 (slim 모드, time-series 백엔드)"""
+    return is_slim_mode() or is_timeseries_backend()
+
+
+def hot_collection():
+    """조회/저장 대상 컬렉션 (일반 컬렉션 또는 time-series 컬렉션)"""
+    if is_timeseries_backend():
+        return MongoDB.db[settings.TIMESERIES_COLLECTION]
+    return MongoDB.db.messages
+
+
+def build_telemetry_document(content: dict) -> Dict[str, Any]:
+    """ChirpStack 이벤트에서 API가 사용하는 필드만 뽑은 compact 문서 생성"""
+    values = content.get("values", {})
+    device_info = (content.get("uplinkEvent") or {}).get("deviceInfo", {})
+
+    document = {
+        "devEUI": values.get("devEUI"),
+        "device_name": device_info.get("deviceName", ""),
+        "lat": values.get("latitude", 0.0),
+        "lon": values.get("longitude", 0.0),
+        "tags": device_info.get("tags", {}),
+    }
+    # 배터리 값이 없는 업링크는 필드를 생략 (0으로 저장하면 배터리 부족과 구분되지 않음)
+    if values.get("batteryLevel") is not None:
+        document["battery"] = values["batteryLevel"]
+    return document
+
+
+def build_timeseries_document(telemetry: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    time-series 컬렉션용 문서 생성
+
+    디바이스 식별 정보는 metaField(meta)에 모아 버킷 단위로 묶이게 한다.
+    """
+    tags = telemetry.get("tags") or {}
+    document = {
+        "meta": {
+            "devEUI": telemetry.get("devEUI"),
+            "company": tags.get("company", ""),
+            "type": tags.get("type", ""),
+            "device_name": telemetry.get("device_name", ""),
+        },
+        "lat": telemetry.get("lat", 0.0),
+        "lon": telemetry.get("lon", 0.0),
+    }
+    if telemetry.get("battery") is not None:
+        document["battery"] = telemetry["battery"]
+    return document
+
+
+def extract_telemetry(doc: dict) -> Dict[str, Any]:
+    """
+    저장 형식(full/slim/time-series)에 관계없이 조회용 필드 추출
+
+    full 문서는 content 하위 경로, slim 문서는 최상위 필드,
+    time-series 문서는 meta 필드에서 디바이스 정보를 읽는다.
+    """
+    if "meta" in doc:
+        meta = doc.get("meta") or {}
+        return {
+            "dev_eui": meta.get("devEUI", ""),
+            "device_name": meta.get("device_name", ""),
+            "company": meta.get("company", ""),
+            "sensor_type": meta.get("type", ""),
+            "battery": doc.get("battery", 0),
+            "longitude": doc.get("lon", 0.0),
+            "latitude": doc.get("lat", 0.0),
+            "ts": doc.get("ts"),
+            "publishedAt": doc.get("ts"),
+        }
+
+    if "content" in doc:
+        content = doc.get("content") or {}
+        values = content.get("values", {})
+        device_info = (content.get("uplinkEvent") or {}).get("deviceInfo", {})
+        return {
+            "dev_eui": values.get("devEUI", ""),
+            "device_name": device_info.get("deviceName", ""),
+            "company": device_info.get("tags", {}).get("company", ""),
+            "sensor_type": device_info.get("tags", {}).get("type", ""),
+            "battery": values.get("batteryLevel", 0),
+            "longitude": values.get("longitude", 0.0),
+            "latitude": values.get("latitude", 0.0),
+            "ts": doc.get("ts"),
+            "publishedAt": values.get("publishedAt"),
+        }
+
+    tags = doc.get("tags") or {}
+    return {
+        "dev_eui": doc.get("devEUI", ""),
+        "device_name": doc.get("device_name", ""),
+        "company": tags.get("company", ""),
+        "sensor_type": tags.get("type", ""),
+        "battery": doc.get("battery", 0),
+        "longitude": doc.get("lon", 0.0),
+        "latitude": doc.get("lat", 0.0),
+        "ts": doc.get("ts"),
+        "publishedAt": doc.get("ts"),
+    }
+
+
+def extract_battery(doc: dict) -> Optional[int]:
+    """저장된 배터리 값 (값이 없으면 None - extract_telemetry는 0으로 채움)"""
+    if "content" in doc:
+        return ((doc.get("content") or {}).get("values") or {}).get("batteryLevel")
+    return doc.get("battery")
+
+
+def dev_eui_filter(dev_eui) -> Dict[str, Any]:
+    """full/slim 문서가 섞여 있어도 동작하는 devEUI 조건"""
+    if is_timeseries_backend():
+        return {"meta.devEUI": dev_eui}
+    return {"$or": [{"content.values.devEUI": dev_eui}, {"devEUI": dev_eui}]}
+
+
+def compress_payload(content: dict) -> Binary:
+    """이벤트 원본을 BSON 인코딩 후 zstd 압축"""
+    return Binary(_compressor.compress(bson.encode(content)))
+
+
+def decompress_payload(payload: bytes) -> dict:
+    return bson.decode(_decompressor.decompress(payload))
+
+
+async def save_raw_event(message_id: ObjectId, content: dict, created_at: datetime.datetime):
+    """원본 이벤트를 raw 컬렉션에 hot 문서와 같은 _id로 저장"""
+    await MongoDB.db[settings.RAW_COLLECTION].insert_one({
+        "_id": message_id,
+        "codec": RAW_CODEC,
+        "payload": compress_payload(content),
+        "created_at": created_at,
+    })
+
+
+async def delete_raw_event(message_id: ObjectId):
+    """hot 문서 저장이 실패했을 때 먼저 저장한 원본 이벤트 제거"""
+    await MongoDB.db[settings.RAW_COLLECTION].delete_one({"_id": message_id})
+
+
+async def get_raw_event(message_id: ObjectId) -> Optional[dict]:
+    """
+    메시지의 원본 이벤트 조회
+
+    slim 문서는 raw 컬렉션에서 압축을 풀고, full 문서는 content를 그대로 반환
+    """
+    raw = await MongoDB.db[settings.RAW_COLLECTION].find_one({"_id": message_id})
+    if raw is not None:
+        return decompress_payload(raw["payload"])
+
+    # time-series로 마이그레이션된 문서는 원본 messages 문서와 _id가 같음
+    doc = await MongoDB.db.messages.find_one({"_id": message_id}, {"content": 1})
+    if doc is not None and "content" in doc:
+        return doc["content"]
+    return None
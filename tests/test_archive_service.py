@@ -0,0 +1,160 @@
+import asyncio
+import datetime
+import os
+
+import pytest
+
+from app.core.config import Settings
+from app.db.mongodb import LEGACY_TTL_INDEX_NAME, ensure_indexes
+from app.services import archive_service
+
+
+def days_ago(days: int) -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=days)
+
+
+def telemetry_doc(dev_eui: str, ts: datetime.datetime, created_at: datetime.datetime) -> dict:
+    return {"meta": {"devEUI": dev_eui}, "battery": 90, "lat": 1.0, "lon": 2.0, "ts": ts, "created_at": created_at}
+
+
+def test_late_arrival_in_exported_ts_day_is_exported_before_purge(mongo, archive_settings, monkeypatch):
+    monkeypatch.setattr(archive_settings, "STORAGE_BACKEND", "timeseries")
+    collection = mongo[archive_settings.TIMESERIES_COLLECTION]
+    ts = days_ago(3)
+
+    asyncio.run(collection.insert_one(telemetry_doc("a", ts, ts)))
+    assert asyncio.run(archive_service.export_pending_days()) == 1
+
+    # 해당 ts 날짜를 내보낸 뒤에 저장된 문서 (일시 중지 후 밀린 메시지 등)
+    late = telemetry_doc("a", ts + datetime.timedelta(seconds=1), datetime.datetime.now(datetime.timezone.utc))
+    asyncio.run(collection.insert_one(late))
+
+    pending = asyncio.run(archive_service.pending_export_days())
+    assert [day for day, _ in pending] == [ts.date()]
+    assert pending[0][1] is not None
+    # 다시 내보내기 전에는 해당 날짜를 삭제하지 않음
+    assert asyncio.run(archive_service.purge_archived()) == 0
+
+    assert asyncio.run(archive_service.export_pending_days()) == 1
+    assert asyncio.run(archive_service.pending_export_days()) == []
+    assert asyncio.run(archive_service.purge_archived()) == 2
+
+    rows = archive_service.read_archived_messages("a", days_ago(4), days_ago(2))
+    assert len(rows) == 2
+    assert rows[0]["id"] == str(late["_id"])
+
+
+def test_export_day_writes_in_chunks_and_keeps_missing_battery(mongo, archive_settings, monkeypatch):
+    monkeypatch.setattr(archive_settings, "ARCHIVE_CHUNK_ROWS", 2)
+    ts = days_ago(3)
+    docs = [{"devEUI": "a", "ts": ts + datetime.timedelta(seconds=i), "created_at": ts} for i in range(5)]
+    docs[0]["battery"] = 80
+    asyncio.run(mongo.messages.insert_many(docs))
+
+    assert asyncio.run(archive_service.export_day(ts.date())) == 5
+
+    directory = archive_service._partition_dir("a", ts.date())
+    assert len(os.listdir(directory)) == 3
+
+    rows = archive_service.read_archived_messages("a", days_ago(4), days_ago(2))
+    assert len(rows) == 5
+    battery = {row["id"]: row["battery"] for row in rows}
+    assert battery[str(docs[0]["_id"])] == 80
+    assert battery[str(docs[1]["_id"])] is None
+
+
+def archive_row(row_id: str, ts: datetime.datetime, battery=50) -> dict:
+    return {
+        "id": row_id, "dev_eui": "a", "device_name": "sensor", "company": "acme", "sensor_type": "gps",
+        "battery": battery, "longitude": 127.0, "latitude": 37.5, "ts": ts,
+    }
+
+
+@pytest.mark.parametrize("archive_format,suffix", [("ndjson", ".ndjson.gz"), ("parquet", ".parquet")])
+def test_write_and_read_back(archive_settings, monkeypatch, archive_format, suffix):
+    monkeypatch.setattr(archive_settings, "ARCHIVE_FORMAT", archive_format)
+    day = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    rows = [archive_row(str(i), day + datetime.timedelta(hours=i)) for i in range(3)]
+    rows[1]["battery"] = None
+
+    path = archive_service.write_partition("a", day.date(), "p1", rows)
+    assert path.endswith(suffix)
+
+    result = archive_service.read_archived_messages("a", day, day + datetime.timedelta(hours=1))
+    assert [row["id"] for row in result] == ["1", "0"]
+    assert result[0]["battery"] is None
+    assert result[1] == rows[0]
+    assert result[1]["ts"].tzinfo is not None
+
+
+def test_duplicate_rows_across_parts_are_read_once(archive_settings):
+    day = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    archive_service.write_partition("a", day.date(), "p1", [archive_row("1", day)])
+    archive_service.write_partition("a", day.date(), "p2", [archive_row("1", day), archive_row("2", day)])
+
+    end = day + datetime.timedelta(days=1)
+    assert [row_id for _, row_id in archive_service.read_archived_keys("a", day, end)] == ["2", "1"]
+    assert len(archive_service.read_archived_messages("a", day, end)) == 2
+    assert [row["id"] for row in archive_service.read_archived_messages("a", day, end, {"2"})] == ["2"]
+
+
+def test_lease_is_held_by_one_owner(mongo, archive_settings, monkeypatch):
+    assert asyncio.run(archive_service.acquire_archive_lease())
+    # 같은 소유자는 갱신 가능
+    assert asyncio.run(archive_service.acquire_archive_lease())
+
+    monkeypatch.setattr(archive_service, "LEASE_OWNER", "other-pod")
+    assert not asyncio.run(archive_service.acquire_archive_lease())
+
+    # 만료된 lease는 다른 레플리카가 가져감
+    asyncio.run(mongo.leases.update_one({"_id": archive_service.ARCHIVE_LEASE_ID}, {"$set": {"expires_at": days_ago(1)}}))
+    assert asyncio.run(archive_service.acquire_archive_lease())
+
+    asyncio.run(archive_service.release_archive_lease())
+    assert asyncio.run(mongo.leases.count_documents({})) == 0
+
+
+def test_export_skipped_while_another_replica_holds_lease(mongo, archive_settings, monkeypatch):
+    ts = days_ago(3)
+    asyncio.run(mongo.messages.insert_one({"devEUI": "a", "ts": ts, "created_at": ts}))
+    asyncio.run(mongo.leases.insert_one({"_id": archive_service.ARCHIVE_LEASE_ID, "owner": "other-pod", "expires_at": days_ago(-1)}))
+
+    assert asyncio.run(archive_service.export_pending_days()) == 0
+    assert asyncio.run(mongo.archive_state.count_documents({})) == 0
+
+
+def test_nothing_is_purged_without_shared_storage(mongo, archive_settings, monkeypatch):
+    ts = days_ago(3)
+    asyncio.run(mongo.messages.insert_one({"devEUI": "a", "ts": ts, "created_at": ts}))
+    asyncio.run(archive_service.export_pending_days())
+
+    monkeypatch.setattr(archive_settings, "ARCHIVE_SHARED_STORAGE", False)
+    assert asyncio.run(archive_service.purge_archived()) == 0
+    assert asyncio.run(mongo.messages.count_documents({})) == 1
+
+
+def test_purge_stops_at_first_unexported_day(mongo, archive_settings):
+    docs = [{"devEUI": "a", "ts": days_ago(d), "created_at": days_ago(d)} for d in (5, 4, 3)]
+    asyncio.run(mongo.messages.insert_many(docs))
+    asyncio.run(archive_service.export_day(docs[0]["created_at"].date()))
+
+    # 4일 전 날짜를 아직 내보내지 않았으므로 5일 전 문서만 삭제
+    assert asyncio.run(archive_service.purge_archived()) == 1
+
+    asyncio.run(archive_service.export_pending_days())
+    assert asyncio.run(archive_service.purge_archived()) == 2
+
+
+@pytest.mark.parametrize("retention_days", [-1, 1])
+def test_retention_days_must_be_disabled_or_at_least_two(retention_days):
+    with pytest.raises(ValueError):
+        Settings(RETENTION_DAYS=retention_days)
+
+
+def test_ensure_indexes_replaces_legacy_ttl_index(mongo):
+    asyncio.run(mongo.messages.create_index("created_at", expireAfterSeconds=60, name=LEGACY_TTL_INDEX_NAME))
+    asyncio.run(ensure_indexes())
+
+    indexes = asyncio.run(mongo.messages.index_information())
+    assert LEGACY_TTL_INDEX_NAME not in indexes
+    assert "expireAfterSeconds" not in indexes["created_at"]
@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from app.schemas.message import MessageCreate
+from app.services import dedup_service, message_service
+from app.services.dedup_service import DedupCache, get_dedup_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(dedup_service.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_seen_after_add(clock):
+    cache = DedupCache(max_size=10, ttl_seconds=60)
+    assert not cache.seen("a")
+    cache.add("a")
+    assert cache.seen("a")
+
+
+def test_entry_expires_after_ttl(clock):
+    cache = DedupCache(max_size=10, ttl_seconds=60)
+    cache.add("a")
+    clock[0] += 61
+    assert not cache.seen("a")
+    assert len(cache) == 0
+
+
+def test_evicts_least_recently_used(clock):
+    cache = DedupCache(max_size=2, ttl_seconds=60)
+    cache.add("a")
+    cache.add("b")
+    # a를 조회하면 가장 최근 사용으로 이동하므로 b가 제거됨
+    assert cache.seen("a")
+    cache.add("c")
+    assert cache.seen("a")
+    assert not cache.seen("b")
+    assert cache.seen("c")
+
+
+def test_discard_removes_key(clock):
+    cache = DedupCache(max_size=10, ttl_seconds=60)
+    cache.add("a")
+    cache.discard("a")
+    cache.discard("missing")
+    assert not cache.seen("a")
+
+
+class SlowCollection:
+    """insert_one이 끝나기 전에 다른 메시지가 처리되도록 대기하는 컬렉션"""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.inserted = []
+
+    async def insert_one(self, document):
+        await asyncio.sleep(0)
+        if self.fail:
+            raise RuntimeError("write failed")
+        self.inserted.append(document)
+
+
+@pytest.fixture
+def store(monkeypatch, clock):
+    cache = DedupCache(max_size=10, ttl_seconds=60)
+    monkeypatch.setattr(message_service, "dedup_cache", cache)
+    monkeypatch.setattr(message_service, "stores_raw_separately", lambda: False)
+    return cache
+
+
+def uplink_message():
+    return MessageCreate(
+        content={"values": {"devEUI": "a1"}, "uplinkEvent": {"deduplicationId": "abc"}},
+        routing_key="a1",
+    )
+
+
+def test_concurrent_duplicates_are_stored_once(monkeypatch, store):
+    collection = SlowCollection()
+    monkeypatch.setattr(message_service, "hot_collection", lambda: collection)
+
+    async def run():
+        return await asyncio.gather(
+            message_service.create_message(uplink_message()),
+            message_service.create_message(uplink_message()),
+        )
+
+    results = asyncio.run(run())
+    assert sum(result is not None for result in results) == 1
+    assert len(collection.inserted) == 1
+
+
+def test_failed_insert_releases_dedup_key(monkeypatch, store):
+    monkeypatch.setattr(message_service, "hot_collection", lambda: SlowCollection(fail=True))
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(message_service.create_message(uplink_message()))
+    # 재전달된 메시지는 다시 저장을 시도할 수 있어야 함
+    assert not store.seen("abc")
+
+
+def test_dedup_key_prefers_deduplication_id():
+    payload = {
+        "values": {"devEUI": "a1"},
+        "uplinkEvent": {"deduplicationId": "abc", "fCnt": 1, "time": "2025-04-28T02:44:39Z"},
+    }
+    assert get_dedup_key(payload) == "abc"
+
+
+def test_dedup_key_falls_back_to_dev_eui_fcnt_time():
+    payload = {
+        "values": {"devEUI": "a1"},
+        "uplinkEvent": {"fCnt": 0, "time": "2025-04-28T02:44:39Z"},
+    }
+    assert get_dedup_key(payload) == "a1:0:2025-04-28T02:44:39Z"
+
+
+def test_dedup_key_none_without_identifiers():
+    assert get_dedup_key({"values": {"devEUI": "a1"}}) is None
@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+
+from app.core.config import get_settings
+from app.services.flow_control import FLOW_NORMAL, FLOW_PAUSED, FLOW_THROTTLED, FlowController
+
+settings = get_settings()
+
+
+class Consumer:
+    """FlowController 콜백 호출 기록"""
+
+    def __init__(self):
+        self.prefetch_calls = []
+        self.paused = False
+
+    async def set_prefetch(self, prefetch: int):
+        self.prefetch_calls.append(prefetch)
+
+    async def pause(self):
+        self.paused = True
+
+    async def resume(self):
+        self.paused = False
+
+
+@pytest.fixture
+def consumer():
+    return Consumer()
+
+
+@pytest.fixture
+def flow(consumer):
+    return FlowController(consumer.set_prefetch, consumer.pause, consumer.resume)
+
+
+def test_full_prefetch_with_fast_writes_does_not_pause(flow, consumer):
+    for _ in range(settings.FLOW_PREFETCH_MAX):
+        flow.on_start()
+    flow.latency_ms = 5
+
+    asyncio.run(flow.evaluate())
+    assert flow.state == FLOW_NORMAL
+    assert not consumer.paused
+
+
+def test_high_latency_halves_prefetch(flow, consumer):
+    flow.latency_ms = settings.FLOW_LATENCY_HIGH_MS
+
+    asyncio.run(flow.evaluate())
+    assert flow.state == FLOW_THROTTLED
+    assert flow.prefetch == settings.FLOW_PREFETCH_MAX // 2
+    assert consumer.prefetch_calls == [settings.FLOW_PREFETCH_MAX // 2]
+
+
+def test_critical_latency_pauses(flow, consumer):
+    flow.latency_ms = settings.FLOW_LATENCY_CRITICAL_MS
+
+    asyncio.run(flow.evaluate())
+    assert flow.state == FLOW_PAUSED
+    assert flow.is_paused
+    assert consumer.paused
+
+
+def test_saturation_with_high_latency_pauses(flow, consumer):
+    flow.in_flight = settings.FLOW_PREFETCH_MAX
+    flow.latency_ms = settings.FLOW_LATENCY_HIGH_MS
+
+    # prefetch를 줄여도 처리 중 메시지가 빠지지 않으면 FLOW_SATURATION_TICKS 번째에 일시 중지
+    for _ in range(settings.FLOW_SATURATION_TICKS - 1):
+        asyncio.run(flow.evaluate())
+        assert flow.state == FLOW_THROTTLED
+    asyncio.run(flow.evaluate())
+    assert flow.state == FLOW_PAUSED
+    assert consumer.paused
+
+
+def test_saturation_resets_when_in_flight_drops(flow, consumer):
+    flow.in_flight = settings.FLOW_PREFETCH_MAX
+    flow.latency_ms = settings.FLOW_LATENCY_HIGH_MS
+    asyncio.run(flow.evaluate())
+
+    flow.in_flight = 0
+    asyncio.run(flow.evaluate())
+    assert flow.saturated_ticks == 0
+    assert flow.state == FLOW_THROTTLED
+
+
+def test_stays_paused_until_in_flight_drains(flow, consumer):
+    flow.in_flight = settings.FLOW_PREFETCH_MAX
+    flow.latency_ms = settings.FLOW_LATENCY_CRITICAL_MS
+    asyncio.run(flow.evaluate())
+    assert flow.state == FLOW_PAUSED
+
+    flow.latency_ms = 5
+    flow.in_flight = int(flow.prefetch * settings.FLOW_RESUME_RATIO) + 1
+    asyncio.run(flow.evaluate())
+    assert flow.state == FLOW_PAUSED
+
+    flow.in_flight = int(flow.prefetch * settings.FLOW_RESUME_RATIO)
+    asyncio.run(flow.evaluate())
+    assert flow.state == FLOW_THROTTLED
+    assert not consumer.paused
+
+
+def test_resumes_at_min_prefetch_after_drain(flow, consumer):
+    flow.latency_ms = settings.FLOW_LATENCY_CRITICAL_MS
+    asyncio.run(flow.evaluate())
+
+    # 처리 중 메시지가 모두 빠지면 지연 값과 관계없이 재개해서 다시 측정
+    asyncio.run(flow.evaluate())
+    assert flow.state == FLOW_THROTTLED
+    assert flow.prefetch == settings.FLOW_PREFETCH_MIN
+    assert flow.latency_ms == settings.FLOW_LATENCY_HIGH_MS
+    assert not consumer.paused
+
+
+def test_prefetch_recovers_additively(flow, consumer):
+    flow.prefetch = settings.FLOW_PREFETCH_MAX - settings.FLOW_PREFETCH_STEP - 1
+    flow.state = FLOW_THROTTLED
+
+    asyncio.run(flow.evaluate())
+    assert flow.prefetch == settings.FLOW_PREFETCH_MAX - 1
+    assert flow.state == FLOW_THROTTLED
+
+    asyncio.run(flow.evaluate())
+    assert flow.prefetch == settings.FLOW_PREFETCH_MAX
+    assert flow.state == FLOW_NORMAL
+
@@ -0,0 +1,106 @@
+import asyncio
+import datetime
+
+from app.core.config import get_settings
+from app.services import liveness_service
+from app.services.liveness_service import (
+    EVENT_LOW_BATTERY, EVENT_OFFLINE, EVENT_ONLINE, STATUS_OFFLINE, STATUS_ONLINE, LivenessTracker
+)
+
+settings = get_settings()
+
+T0 = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def offline_after(tracker: LivenessTracker, dev_eui: str) -> datetime.datetime:
+    return datetime.datetime.fromtimestamp(tracker.devices[dev_eui].deadline, datetime.timezone.utc)
+
+
+def test_device_goes_offline_after_deadline():
+    tracker = LivenessTracker()
+    tracker.observe("a", T0)
+    deadline = offline_after(tracker, "a")
+
+    assert tracker.check(deadline - datetime.timedelta(seconds=1)) == 0
+    assert tracker.devices["a"].status == STATUS_ONLINE
+
+    assert tracker.check(deadline) == 1
+    assert tracker.devices["a"].status == STATUS_OFFLINE
+    assert tracker.recent_events[-1]["type"] == EVENT_OFFLINE
+
+
+def test_stale_heap_entry_is_ignored():
+    tracker = LivenessTracker()
+    tracker.observe("a", T0)
+    first_deadline = offline_after(tracker, "a")
+    # 새 업링크로 기한이 늦춰지면 이전 heap 항목은 version이 달라 무시됨
+    tracker.observe("a", T0 + datetime.timedelta(seconds=1000))
+
+    assert tracker.check(first_deadline) == 0
+    assert tracker.devices["a"].status == STATUS_ONLINE
+    assert tracker.check(offline_after(tracker, "a")) == 1
+
+
+def test_offline_device_comes_back_online():
+    tracker = LivenessTracker()
+    tracker.observe("a", T0)
+    deadline = offline_after(tracker, "a")
+    tracker.check(deadline)
+
+    tracker.observe("a", deadline + datetime.timedelta(seconds=1))
+    assert tracker.devices["a"].status == STATUS_ONLINE
+    assert tracker.recent_events[-1]["type"] == EVENT_ONLINE
+
+
+def test_low_battery_event_only_on_change():
+    tracker = LivenessTracker()
+    tracker.observe("a", T0, settings.LOW_BATTERY_THRESHOLD - 1)
+    tracker.observe("a", T0 + datetime.timedelta(seconds=1), settings.LOW_BATTERY_THRESHOLD - 2)
+
+    assert tracker.devices["a"].low_battery
+    assert [event["type"] for event in tracker.recent_events] == [EVENT_LOW_BATTERY]
+
+
+def test_missing_battery_is_not_low_battery():
+    tracker = LivenessTracker()
+    tracker.observe("a", T0, None)
+    assert tracker.devices["a"].battery is None
+    assert not tracker.devices["a"].low_battery
+
+
+def test_rehydrate_without_battery(monkeypatch):
+    tracker = LivenessTracker()
+    now = datetime.datetime.now(datetime.timezone.utc)
+    docs = [
+        # battery 필드가 없는 slim 문서
+        {"devEUI": "a", "ts": now},
+        {"devEUI": "b", "battery": 5, "ts": now},
+    ]
+
+    async def latest_device_documents():
+        for doc in docs:
+            yield doc
+
+    monkeypatch.setattr(liveness_service, "liveness_tracker", tracker)
+    monkeypatch.setattr(liveness_service, "latest_device_documents", latest_device_documents)
+    asyncio.run(liveness_service.rehydrate_liveness())
+
+    assert tracker.devices["a"].battery is None
+    assert not tracker.devices["a"].low_battery
+    assert tracker.devices["b"].low_battery
+    # 복원 시에는 이벤트를 발생시키지 않음
+    assert len(tracker.recent_events) == 0
+
+
+def test_observe_uplink_skips_messages_without_dev_eui(monkeypatch):
+    from app.core import events
+
+    tracker = LivenessTracker()
+    monkeypatch.setattr(events, "liveness_tracker", tracker)
+
+    asyncio.run(events.observe_uplink({"values": {"batteryLevel": 50}}))
+    asyncio.run(events.observe_uplink({"values": {"devEUI": "a", "publishedAt": "2024-01-01T00:00:00Z"}}))
+
+    assert list(tracker.devices) == ["a"]
+    assert tracker.devices["a"].last_seen == T0
+    assert tracker.devices["a"].battery is None
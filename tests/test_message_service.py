@@ -0,0 +1,59 @@
+import asyncio
+import datetime
+
+from app.schemas.message import MessageQuery
+from app.services import archive_service, message_service
+
+
+def ago(**kwargs) -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(**kwargs)
+
+
+def slim_doc(ts: datetime.datetime, created_at: datetime.datetime, battery: int) -> dict:
+    return {"devEUI": "a", "battery": battery, "lat": 1.0, "lon": 2.0, "ts": ts, "created_at": created_at}
+
+
+def fetch_all_pages(page_size: int) -> list:
+    pages = []
+    page = 1
+    while True:
+        query = MessageQuery(dev_eui="a", start_date=ago(days=10), page=page, page_size=page_size)
+        result = asyncio.run(message_service.get_messages_by_dev_eui(query))
+        pages.append(result)
+        if page >= result["total_pages"]:
+            return pages
+        page += 1
+
+
+def test_pagination_across_retention_cutoff(mongo, archive_settings):
+    collection = mongo.messages
+    # 보존 기간 이전: 아카이브에만 있는 문서 3개 + 아카이브와 MongoDB 양쪽에 있는 문서 1개
+    archived_only = [slim_doc(ago(days=5, minutes=i), ago(days=5, minutes=i), 10 + i) for i in range(3)]
+    both = slim_doc(ago(days=4), ago(days=4), 20)
+    asyncio.run(collection.insert_many(archived_only + [both]))
+    asyncio.run(archive_service.export_pending_days())
+    asyncio.run(collection.delete_many({"_id": {"$in": [doc["_id"] for doc in archived_only]}}))
+
+    # 보존 기간 이전이지만 아직 내보내지 않은 문서 2개 + 보존 기간 이후 문서 3개
+    unexported = [slim_doc(ago(days=3, minutes=i), ago(minutes=1), 30 + i) for i in range(2)]
+    live = [slim_doc(ago(hours=i + 1), ago(hours=i + 1), 40 + i) for i in range(3)]
+    asyncio.run(collection.insert_many(unexported + live))
+
+    pages = fetch_all_pages(page_size=4)
+
+    assert [page["total"] for page in pages] == [9, 9, 9]
+    logs = [log for page in pages for log in page["logs"]]
+    assert [log.battery for log in logs] == [40, 41, 42, 30, 31, 20, 10, 11, 12]
+    published = [log.publishedAt for log in logs]
+    assert published == sorted(published, reverse=True)
+
+
+def test_pagination_without_archive_uses_mongo_only(mongo, archive_settings, monkeypatch):
+    monkeypatch.setattr(archive_settings, "ARCHIVE_SHARED_STORAGE", False)
+    docs = [slim_doc(ago(days=i + 1), ago(days=i + 1), i) for i in range(6)]
+    asyncio.run(mongo.messages.insert_many(docs))
+
+    pages = fetch_all_pages(page_size=4)
+
+    assert pages[0]["total"] == 6
+    assert [log.battery for page in pages for log in page["logs"]] == list(range(6))
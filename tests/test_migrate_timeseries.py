@@ -0,0 +1,93 @@
+import asyncio
+import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.core.config import get_settings
+from app.scripts import migrate_timeseries
+from app.scripts.migrate_timeseries import MIGRATION_ID, migrate, to_timeseries_document
+from app.services import message_service
+from app.services.storage_service import build_telemetry_document
+
+settings = get_settings()
+
+CREATED_AT = datetime.datetime(2024, 1, 2, tzinfo=datetime.timezone.utc)
+PUBLISHED_AT = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+EVENT = {
+    "values": {"devEUI": "a1", "batteryLevel": 55, "latitude": 37.5, "longitude": 127.0,
+               "publishedAt": "2024-01-01T00:00:00Z"},
+    "uplinkEvent": {"deviceInfo": {"deviceName": "sensor", "tags": {"company": "acme", "type": "gps"}}},
+}
+
+
+def source_doc(**fields) -> dict:
+    return {"_id": ObjectId(), "routing_key": "a1", "created_at": CREATED_AT, "content": EVENT, **fields}
+
+
+def test_full_document_is_converted():
+    doc = source_doc(ts=PUBLISHED_AT, dedup_key="d-1")
+    ts_doc = to_timeseries_document(doc)
+
+    assert ts_doc["_id"] == doc["_id"]
+    assert ts_doc["meta"] == {"devEUI": "a1", "company": "acme", "type": "gps", "device_name": "sensor"}
+    assert ts_doc["battery"] == 55
+    assert (ts_doc["lat"], ts_doc["lon"]) == (37.5, 127.0)
+    assert ts_doc["ts"] == PUBLISHED_AT
+    assert ts_doc["created_at"] == CREATED_AT
+    assert ts_doc["dedup_key"] == "d-1"
+
+
+def test_slim_document_is_converted_without_battery():
+    slim = build_telemetry_document({"values": {"devEUI": "a1"}})
+    ts_doc = to_timeseries_document({"_id": ObjectId(), "created_at": CREATED_AT, **slim})
+
+    assert ts_doc["meta"]["devEUI"] == "a1"
+    assert "battery" not in ts_doc
+    assert "dedup_key" not in ts_doc
+
+
+def test_ts_falls_back_to_published_at_then_created_at():
+    assert to_timeseries_document(source_doc())["ts"] == PUBLISHED_AT
+
+    doc = source_doc(content={"values": {"devEUI": "a1"}})
+    assert to_timeseries_document(doc)["ts"] == CREATED_AT
+
+
+@pytest.fixture
+def timeseries_target(mongo, monkeypatch):
+    # in-memory MongoDB는 time-series 컬렉션 옵션을 지원하지 않으므로 일반 컬렉션으로 대상 생성
+    async def ensure_timeseries_collection():
+        pass
+
+    monkeypatch.setattr(migrate_timeseries, "ensure_timeseries_collection", ensure_timeseries_collection)
+    return mongo[settings.TIMESERIES_COLLECTION]
+
+
+def test_migration_resumes_without_duplicates(mongo, timeseries_target):
+    docs = [source_doc(ts=PUBLISHED_AT + datetime.timedelta(minutes=i)) for i in range(5)]
+    asyncio.run(mongo.messages.insert_many(docs))
+
+    # 배치 일부를 복사한 뒤 체크포인트 저장 전에 중단된 상황
+    asyncio.run(timeseries_target.insert_many([to_timeseries_document(doc) for doc in docs[:3]]))
+    asyncio.run(mongo.migration_state.insert_one({"_id": MIGRATION_ID, "last_id": docs[0]["_id"]}))
+
+    asyncio.run(migrate(batch_size=2))
+
+    assert asyncio.run(timeseries_target.count_documents({})) == 5
+    state = asyncio.run(mongo.migration_state.find_one({"_id": MIGRATION_ID}))
+    assert state["last_id"] == docs[-1]["_id"]
+
+
+def test_latest_per_device_on_timeseries_backend(mongo, timeseries_target, monkeypatch):
+    monkeypatch.setattr(settings, "STORAGE_BACKEND", "timeseries")
+    docs = [source_doc(ts=PUBLISHED_AT + datetime.timedelta(minutes=i)) for i in range(3)]
+    docs.append(source_doc(ts=PUBLISHED_AT, content={"values": {"devEUI": "b2", "batteryLevel": 10}}))
+    asyncio.run(timeseries_target.insert_many([to_timeseries_document(doc) for doc in docs]))
+
+    devices = {device.dev_eui: device for device in asyncio.run(message_service.get_all_devices_latest_data())}
+
+    assert set(devices) == {"a1", "b2"}
+    assert devices["a1"].publishedAt.replace(tzinfo=datetime.timezone.utc) == docs[2]["ts"]
+    assert devices["b2"].battery == 10
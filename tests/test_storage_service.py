@@ -0,0 +1,113 @@
+import asyncio
+import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.core.config import get_settings
+from app.schemas.message import MessageCreate
+from app.services import message_service
+from app.services.storage_service import (
+    build_telemetry_document, build_timeseries_document, compress_payload, decompress_payload,
+    extract_battery, extract_telemetry, get_raw_event
+)
+
+settings = get_settings()
+
+TS = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+EVENT = {
+    "values": {
+        "devEUI": "a1",
+        "batteryLevel": 55,
+        "latitude": 37.5,
+        "longitude": 127.0,
+        "publishedAt": "2024-01-01T00:00:00Z",
+    },
+    "uplinkEvent": {
+        "deduplicationId": "d-1",
+        "deviceInfo": {"deviceName": "sensor", "tags": {"company": "acme", "type": "gps"}},
+        "rxInfo": [{"gatewayId": "g1", "rssi": -80}],
+    },
+}
+
+EXPECTED = {
+    "dev_eui": "a1",
+    "device_name": "sensor",
+    "company": "acme",
+    "sensor_type": "gps",
+    "battery": 55,
+    "longitude": 127.0,
+    "latitude": 37.5,
+    "ts": TS,
+}
+
+
+def full_doc() -> dict:
+    return {"content": EVENT, "ts": TS}
+
+
+def slim_doc() -> dict:
+    return {**build_telemetry_document(EVENT), "ts": TS}
+
+
+def timeseries_doc() -> dict:
+    return {**build_timeseries_document(build_telemetry_document(EVENT)), "ts": TS}
+
+
+@pytest.mark.parametrize("make_doc", [full_doc, slim_doc, timeseries_doc])
+def test_extract_telemetry_is_the_same_for_every_layout(make_doc):
+    telemetry = extract_telemetry(make_doc())
+    assert {key: telemetry[key] for key in EXPECTED} == EXPECTED
+
+
+def test_missing_battery_is_omitted_and_extracted_as_none():
+    event = {"values": {"devEUI": "a1"}}
+    slim = build_telemetry_document(event)
+    timeseries = build_timeseries_document(slim)
+
+    assert "battery" not in slim
+    assert "battery" not in timeseries
+    for doc in (slim, timeseries, {"content": event}):
+        assert extract_battery(doc) is None
+        # 조회 API는 기존처럼 0으로 응답
+        assert extract_telemetry(doc)["battery"] == 0
+
+
+def test_compress_round_trip():
+    payload = compress_payload(EVENT)
+    assert decompress_payload(payload) == EVENT
+    assert len(payload) < len(str(EVENT))
+
+
+@pytest.fixture
+def slim_mode(monkeypatch):
+    monkeypatch.setattr(settings, "STORAGE_MODE", "slim")
+    monkeypatch.setattr(settings, "STORAGE_BACKEND", "collection")
+    monkeypatch.setattr(message_service, "dedup_cache", message_service.dedup_cache.__class__(10, 60))
+
+
+def test_slim_message_stores_raw_event_with_same_id(mongo, slim_mode):
+    created = asyncio.run(message_service.create_message(MessageCreate(content=EVENT, routing_key="a1")))
+
+    message_id = ObjectId(created.id)
+    hot = asyncio.run(mongo.messages.find_one({"_id": message_id}))
+    assert "content" not in hot
+    assert hot["devEUI"] == "a1"
+    assert hot["ts"].replace(tzinfo=datetime.timezone.utc) == TS
+
+    raw = asyncio.run(get_raw_event(message_id))
+    assert raw["uplinkEvent"]["rxInfo"] == EVENT["uplinkEvent"]["rxInfo"]
+
+
+class FailingCollection:
+    async def insert_one(self, document):
+        raise RuntimeError("write failed")
+
+
+def test_failed_hot_insert_removes_raw_event(mongo, slim_mode, monkeypatch):
+    monkeypatch.setattr(message_service, "hot_collection", FailingCollection)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(message_service.create_message(MessageCreate(content=EVENT, routing_key="a1")))
+    assert asyncio.run(mongo[settings.RAW_COLLECTION].count_documents({})) == 0
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta, timezone
+
+from app.core.timeutils import extract_canonical_ts, parse_timestamp
+
+
+def test_parse_nanosecond_utc_string():
+    assert parse_timestamp("2025-04-28T02:44:39.559014059Z") == datetime(
+        2025, 4, 28, 2, 44, 39, 559014, tzinfo=timezone.utc
+    )
+
+
+def test_parse_offset_string_is_converted_to_utc():
+    assert parse_timestamp("2025-04-28T11:44:39+09:00") == datetime(2025, 4, 28, 2, 44, 39, tzinfo=timezone.utc)
+
+
+def test_parse_naive_values_are_assumed_utc():
+    assert parse_timestamp("2025-04-28T02:44:39") == datetime(2025, 4, 28, 2, 44, 39, tzinfo=timezone.utc)
+    assert parse_timestamp(datetime(2025, 4, 28, 2, 44, 39)) == datetime(2025, 4, 28, 2, 44, 39, tzinfo=timezone.utc)
+
+
+def test_parse_aware_datetime_is_converted_to_utc():
+    kst = timezone(timedelta(hours=9))
+    assert parse_timestamp(datetime(2025, 4, 28, 11, 0, tzinfo=kst)) == datetime(2025, 4, 28, 2, 0, tzinfo=timezone.utc)
+
+
+def test_parse_invalid_values_return_none():
+    assert parse_timestamp("not a date") is None
+    assert parse_timestamp("") is None
+    assert parse_timestamp(None) is None
+    assert parse_timestamp(12345) is None
+
+
+def test_canonical_ts_prefers_values_published_at():
+    content = {
+        "values": {"publishedAt": "2025-04-28T02:00:00Z"},
+        "uplinkEvent": {"time": "2025-04-28T03:00:00Z"},
+    }
+    assert extract_canonical_ts(content) == datetime(2025, 4, 28, 2, 0, tzinfo=timezone.utc)
+
+
+def test_canonical_ts_falls_back_to_uplink_time():
+    content = {"values": {"publishedAt": "garbage"}, "uplinkEvent": {"time": "2025-04-28T03:00:00Z"}}
+    assert extract_canonical_ts(content) == datetime(2025, 4, 28, 3, 0, tzinfo=timezone.utc)
+    assert extract_canonical_ts({}) is None